@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+销售仪表板基准测试（tw.py / tq.py）
+特点：生成与 supermarket_sales 同列的合成数据（1千 ~ 1千万行），分阶段计时：
+Excel读取、时间解析、筛选、核心指标聚合、图表构建、序列化；
+现有写法（isin+copy / groupby）与新引擎（位图筛选 / 数据立方体）并列对比，结果输出为JSON
+
+用法：python bench_sales.py --sizes 1000 100000 10000000 --output bench_sales.json
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import tempfile
+import time
+from datetime import datetime
+
+import matplotlib
+matplotlib.use("Agg")  # 无界面后端，只测图表构建与栅格化
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from sales_cube import SalesCube
+from sales_filter import FILTER_DIMS, FilterEngine
+from tq import hour_chart, product_line_chart
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+# Excel单表最多约104万行，且写入很慢，超过该行数跳过Excel读取阶段
+MAX_EXCEL_ROWS = 100_000
+
+# 合成数据的维度取值（与真实数据一致）
+CITIES = ["太原", "临汾", "大同"]
+BRANCHES = ["1号店", "2号店", "3号店"]
+CUSTOMER_TYPES = ["会员用户", "普通用户"]
+GENDERS = ["男性", "女性"]
+PRODUCT_TYPES = ["健康美容", "电子配件", "食品饮料", "运动旅行", "时尚配饰", "家居生活"]
+
+# 基准筛选条件：两个城市、全部顾客类型、单一性别
+SELECTION = {"城市": ["太原", "临汾"], "顾客类型": CUSTOMER_TYPES, "性别": ["女性"]}
+
+
+def make_sales_frame(n_rows, seed=42):
+    """生成n_rows行合成销售数据（列与 supermarket_sales.xlsx 相同，时间为字符串）"""
+    rng = np.random.default_rng(seed)
+    branch = rng.integers(0, 3, n_rows)
+    unit_price = rng.uniform(10, 100, n_rows).round(2)
+    quantity = rng.integers(1, 11, n_rows)
+    seconds = rng.integers(10 * 3600, 21 * 3600, n_rows)
+    order_no = rng.integers(0, 10**10, n_rows)
+    return pd.DataFrame({
+        "订单号": pd.Series(order_no).map(lambda x: f"{x // 10**6:04d}-{x // 10**4 % 100:02d}-{x % 10**4:04d}"),
+        "分店": pd.Categorical.from_codes(branch, BRANCHES),
+        "城市": pd.Categorical.from_codes(branch, CITIES),
+        "顾客类型": pd.Categorical.from_codes(rng.integers(0, 2, n_rows), CUSTOMER_TYPES),
+        "性别": pd.Categorical.from_codes(rng.integers(0, 2, n_rows), GENDERS),
+        "产品类型": pd.Categorical.from_codes(rng.integers(0, 6, n_rows), PRODUCT_TYPES),
+        "单价": unit_price,
+        "数量": quantity,
+        "总价": (unit_price * quantity).round(2),
+        "日期": pd.Timestamp("2022-01-01") + pd.to_timedelta(rng.integers(0, 90, n_rows), unit="D"),
+        "时间": pd.Series(seconds // 3600).map("{:02d}".format) + ":"
+                + pd.Series(seconds // 60 % 60).map("{:02d}".format) + ":"
+                + pd.Series(seconds % 60).map("{:02d}".format),
+        "评分": rng.uniform(4, 10, n_rows).round(1),
+    })
+
+
+def timed(func, repeat):
+    """运行repeat次，返回 (最后一次结果, 各次耗时秒数)"""
+    result, seconds = None, []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        seconds.append(time.perf_counter() - start)
+    return result, seconds
+
+
+def matplotlib_dashboard(hourly_sales, product_sales):
+    """按tw.py的方式构建16×6双子图并栅格化为PNG，返回PNG字节"""
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 6))
+    ax1.bar(x=hourly_sales.index, height=hourly_sales.values, color='#1f77b4', edgecolor='white')
+    ax1.set_xticks(hourly_sales.index)
+    ax2.barh(y=product_sales.index, width=product_sales.values, color='#ff7f0e', edgecolor='white')
+    plt.tight_layout()
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png")
+    plt.close(fig)
+    return buf.getvalue()
+
+
+def baseline_filter(df):
+    """现有写法：三个isin掩码相与后copy（tw.py）"""
+    return df[
+        (df["城市"].isin(SELECTION["城市"])) &
+        (df["顾客类型"].isin(SELECTION["顾客类型"])) &
+        (df["性别"].isin(SELECTION["性别"]))
+    ].copy()
+
+
+def baseline_kpis(filtered_df):
+    """现有写法：指标与两张图的数据各自扫描一遍（tw.py / tq.py）"""
+    return (
+        filtered_df["总价"].sum(),
+        filtered_df["评分"].mean(),
+        filtered_df["总价"].mean(),
+        filtered_df.groupby("小时数")["总价"].sum(),
+        filtered_df.groupby("产品类型", observed=True)["总价"].sum().sort_values(),
+    )
+
+
+def bench_size(n_rows, repeat, workdir):
+    """对一种数据规模逐阶段计时，返回结果记录列表"""
+    records = []
+
+    def record(stage, engine, func, times=repeat):
+        result, seconds = timed(func, times)
+        records.append({
+            "rows": n_rows, "stage": stage, "engine": engine,
+            "min_s": min(seconds), "median_s": float(np.median(seconds)), "repeat": times,
+        })
+        return result
+
+    df = make_sales_frame(n_rows)
+
+    # 1. 数据读取：Excel（openpyxl） vs Arrow快照（内存映射）
+    if n_rows <= MAX_EXCEL_ROWS:
+        excel_path = os.path.join(workdir, f"sales_{n_rows}.xlsx")
+        df.to_excel(excel_path, index=False)
+        record("load", "excel", lambda: pd.read_excel(excel_path, engine="openpyxl"), times=1)
+    else:
+        records.append({"rows": n_rows, "stage": "load", "engine": "excel",
+                        "skipped": f"超过 {MAX_EXCEL_ROWS} 行"})
+    snap_path = os.path.join(workdir, f"sales_{n_rows}.arrow")
+    feather.write_feather(df, snap_path, compression="uncompressed")
+    record("load", "snapshot", lambda: feather.read_table(snap_path, memory_map=True).to_pandas())
+
+    # 2. 时间解析（提取小时数）
+    df["小时数"] = record("time_parse", "to_datetime",
+                         lambda: pd.to_datetime(df["时间"], format="%H:%M:%S").dt.hour)
+
+    # 3. 筛选：isin+copy vs 位图索引
+    filtered_df = record("filter", "isin_copy", lambda: baseline_filter(df))
+    engine = record("filter_build", "bitmap", lambda: FilterEngine(df, FILTER_DIMS), times=1)
+    record("filter", "bitmap", lambda: engine.select(SELECTION))
+
+    # 4. 核心指标聚合：groupby vs 数据立方体
+    record("kpi", "groupby", lambda: baseline_kpis(filtered_df))
+    cube = record("kpi_build", "cube", lambda: SalesCube(df), times=1)
+
+    def cube_query():
+        mask = cube.mask(SELECTION)
+        return cube.kpis(mask), cube.sales_by("小时数", mask), cube.sales_by("产品类型", mask)
+    _, hourly_sales, product_sales = record("kpi", "cube", cube_query)
+
+    # 5. 图表构建：plotly（tq.py） vs matplotlib（tw.py，含栅格化）
+    figs = record("figure", "plotly", lambda: (hour_chart(hourly_sales), product_line_chart(product_sales)))
+    record("figure", "matplotlib", lambda: matplotlib_dashboard(hourly_sales, product_sales))
+
+    # 6. 序列化：筛选结果转Arrow（st.dataframe下发的数据）、plotly图表转JSON
+    record("serialize", "arrow_dataframe", lambda: pa.Table.from_pandas(filtered_df).nbytes)
+    record("serialize", "plotly_json", lambda: sum(len(fig.to_json()) for fig in figs))
+
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="销售仪表板分阶段基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="合成数据行数")
+    parser.add_argument("--repeat", type=int, default=3, help="每个阶段重复次数（取最小值/中位数）")
+    parser.add_argument("--output", default=None, help="JSON报告路径（默认输出到终端）")
+    args = parser.parse_args()
+
+    report = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "selection": SELECTION,
+        "results": [],
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        for n_rows in args.sizes:
+            report["results"].extend(bench_size(n_rows, args.repeat, workdir))
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+数据快照缓存 - 各应用共用的表格加载器
+特点：首次解析Excel/CSV后写入Arrow快照（按文件内容哈希命名，类型已处理好），
+之后直接内存映射快照读取；源文件内容变化时哈希随之变化，旧快照自动重建并清理
+"""
+
+import glob
+import hashlib
+import os
+
+import pyarrow as pa
+import pyarrow.feather as feather
+
+# 快照目录（相对路径，和脚本同目录）
+CACHE_DIR = ".data_cache"
+
+# 文件哈希记忆：(绝对路径, 大小, 修改时间) -> 内容哈希，避免每次冷启动都重新计算
+_digest_memo = {}
+
+
+def file_digest(path):
+    """计算文件内容的SHA-256，作为数据版本号"""
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    digest = _digest_memo.get(memo_key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        digest = h.hexdigest()
+        _digest_memo[memo_key] = digest
+    return digest
+
+
+def snapshot_path(path, tag, key):
+    """快照文件路径：<文件名>.<读取方式>.<快照键前16位>.arrow"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(CACHE_DIR, f"{stem}.{tag}.{key[:16]}.arrow")
+
+
+def snapshot_key(path, dtypes=None, version=1):
+    """
+    快照键：源文件内容 + 列类型 + 解析函数版本号，任何一项变化都会生成新快照
+    不从解析函数的代码推断：它调用的其他模块函数、引用的常量改动时都无法可靠察觉，改由调用方显式递增版本号
+    """
+    h = hashlib.sha256(file_digest(path).encode())
+    h.update(repr(sorted((dtypes or {}).items())).encode())
+    h.update(f"v{version}".encode())
+    return h.hexdigest()
+
+
+def _write_snapshot(df, snap):
+    """写入快照（先写临时文件再替换，避免其他进程读到半个文件），并清理同源旧快照"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = f"{snap}.{os.getpid()}.tmp"
+    # 不压缩，才能直接内存映射
+    feather.write_feather(df, tmp_path, compression="uncompressed")
+    os.replace(tmp_path, snap)
+    prefix = snap.rsplit(".", 2)[0]
+    for old in glob.glob(glob.escape(prefix) + ".*.arrow"):
+        if old != snap:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+
+def load_table(path, reader, tag="raw", dtypes=None, version=1):
+    """
+    读取表格数据（带快照缓存）
+    - path：源文件路径
+    - reader：reader(path) -> DataFrame，快照未命中时用它解析源文件（含列处理）
+    - tag：读取方式标识，同一文件的不同读取方式各存一份快照
+    - dtypes：写快照前统一转换的列类型，如 {"城市": "category"}
+    - version：解析函数的版本号，解析逻辑（包括它调用的函数、引用的常量）改动后由调用方递增，旧快照随之失效
+    """
+    snap = snapshot_path(path, tag, snapshot_key(path, dtypes, version))
+    if os.path.exists(snap):
+        try:
+            # split_blocks：数值列尽量直接引用内存映射的缓冲区，不再整块复制
+            return feather.read_table(snap, memory_map=True).to_pandas(split_blocks=True)
+        except (OSError, pa.ArrowInvalid):
+            pass  # 快照损坏时重新解析源文件
+
+    df = reader(path)
+    if dtypes:
+        df = df.astype(dtypes)
+    try:
+        _write_snapshot(df, snap)
+    except (OSError, pa.ArrowException):
+        pass  # 目录只读或类型无法转换时，仅本次不缓存
+    return df
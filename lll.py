@@ -1,10 +1,12 @@
 import streamlit as st
 import pandas as pd
 import altair as alt
-import joblib
 import os
 from PIL import Image
-from sklearn.ensemble import RandomForestRegressor
+from data_cache import file_digest, load_table
+from student_batch import batch_prediction_panel
+from student_model import FOREST_SPEC, encode_students, student_model_store
+from student_stats import load_major_stats
 
 # ====================== 全局配置（白色主题适配） ======================
 st.set_page_config(
@@ -39,7 +41,7 @@ st.markdown("""
 
 # 定义文件路径（已匹配当前目录）
 FILE_PATH = "学生数据表.xlsx"
-MODEL_PATH = "model.pkl"
+READER_VERSION = 1  # 数据解析逻辑（load_data 里的读取+dropna）改动后递增，旧快照随之失效
 CONGRATS_IMG_PATH = "congratulations.png"
 ENCOURAGE_IMG_PATH = "encouragement.png"
 PROJECT_INTRO_IMG_PATH = "project_intro.png"  # 已在当前目录的图片路径
@@ -56,34 +58,44 @@ def check_file_exists(file_path):
 def load_data():
     if not check_file_exists(FILE_PATH):
         return None
-    df = pd.read_excel(FILE_PATH)
-    df = df.dropna()
+    # 命中快照时内存映射读取，Excel内容变化后自动重建快照
+    df = load_table(FILE_PATH, lambda path: pd.read_excel(path).dropna(), tag="lll", version=READER_VERSION)
     return df
 
+@st.cache_data
+def load_major_data(data_version, _df):
+    # 各专业统计表（由已加载的明细统计，和明细快照存放在一起，学生数据表.xlsx 变化时才重新统计）
+    return load_major_stats(_df, FILE_PATH, tag="lll", reader_version=READER_VERSION)
+
 @st.cache_resource
-def train_and_load_model(df):
-    if os.path.exists(MODEL_PATH):
-        return joblib.load(MODEL_PATH)
-    st.info("首次运行，正在训练预测模型...")
-    df_train = df.copy()
-    df_train["性别"] = df_train["性别"].map({"男": 1, "女": 0})
-    df_train["专业"] = pd.factorize(df_train["专业"], sort=True)[0]
-    X = df_train[["性别", "专业", "每周学习时长（小时）", "上课出勤率", "期中考试分数", "作业完成率"]]
-    y = df_train["期末考试分数"]
-    model = RandomForestRegressor(n_estimators=100, random_state=42)
-    model.fit(X, y)
-    joblib.dump(model, MODEL_PATH)
-    st.success("模型训练完成！")
-    return model
+def get_model_store():
+    # 所有会话共用的模型仓库：制品按 数据哈希+训练配置 存放在 .model_registry/
+    return student_model_store()
+
+def load_model(df):
+    # 当前数据版本对应的模型制品；没有时在后台训练随机森林，训练期间用旧制品或线性回归备用模型
+    return get_model_store().serve(df, file_digest(FILE_PATH))
+
+@st.fragment(run_every=2)
+def training_status(serving_key, serving_label):
+    # 后台训练进度（只刷新这一块）；serving_key / serving_label：本次运行正在使用的制品；训练完成后下一次预测自动改用新模型
+    store = get_model_store()
+    if store.training:
+        done, total = store.progress or (0, FOREST_SPEC["params"]["n_estimators"])
+        st.progress(done / total, text=f"正在后台训练随机森林模型：{done}/{total} 棵树，训练完成前暂用{serving_label}模型预测")
+    elif store.current is not None and store.current["key"] != serving_key and not store.is_stale(store.current, file_digest(FILE_PATH)):
+        st.success("随机森林模型已训练完成，下一次预测将使用新模型")
+    elif store.last_error is not None:
+        st.warning(f"模型训练失败，继续使用当前模型：{store.last_error}")
 
 # ====================== 加载资源 ======================
 df = load_data()
 if df is not None:
-    model = train_and_load_model(df)
+    artifact = load_model(df)
 
 # ====================== 侧边栏导航 ======================
 st.sidebar.title("导航菜单")
-page = st.sidebar.radio("选择页面", ["项目介绍", "专业数据分析", "成绩预测"])
+page = st.sidebar.radio("选择页面", ["项目介绍", "专业数据分析", "成绩预测", "批量预测"])
 
 # ====================== 界面1：项目介绍（修复图片加载） ======================
 if page == "项目介绍":
@@ -143,23 +155,15 @@ elif page == "专业数据分析":
         st.stop()
     st.title("专业数据分析")
     
-    major_data = df.groupby("专业").agg({
-        "每周学习时长（小时）": "mean",
-        "期中考试分数": "mean",
-        "期末考试分数": "mean",
-        "上课出勤率": "mean",
-        "性别": lambda x: x.value_counts().to_dict()
-    }).reset_index()
-    major_data["男生人数"] = major_data["性别"].apply(lambda x: x.get("男", 0))
-    major_data["女生人数"] = major_data["性别"].apply(lambda x: x.get("女", 0))
-    major_data = major_data.drop("性别", axis=1)
+    # 预先统计好的专业统计表（均值 + 男女生人数）
+    major_data = load_major_data(file_digest(FILE_PATH), df)
     
     st.subheader("1. 各专业核心指标统计")
     stats_table = major_data[["专业", "每周学习时长（小时）", "期中考试分数", "期末考试分数"]].round(2)
     st.dataframe(stats_table, use_container_width=True)
     
     st.subheader("2. 各专业男女性别比例")
-    gender_data = major_data.melt(id_vars="专业", value_vars=["男生人数", "女生人数"], var_name="性别", value_name="人数")
+    gender_data = major_data[["专业", "男生人数", "女生人数"]].melt(id_vars="专业", var_name="性别", value_name="人数")
     gender_chart = alt.Chart(gender_data).mark_bar().encode(
         x=alt.X("专业:N", title="专业", axis=alt.Axis(labelColor='#000000')),
         y=alt.Y("人数:Q", title="人数", axis=alt.Axis(labelColor='#000000')),
@@ -214,6 +218,13 @@ elif page == "成绩预测":
     
     major_list = df["专业"].unique().tolist()
     
+    # 当前使用的模型制品
+    metrics = artifact["metrics"]
+    st.caption(f"模型：{artifact['model_label']}｜训练数据版本 {artifact['data_hash'][:12]}｜训练时间 {artifact['trained_at']}｜"
+               f"{metrics['validation']}R² {metrics['r2']:.3f}｜{metrics['validation']}平均绝对误差 {metrics['mae']:.2f}分")
+    if get_model_store().is_stale(artifact, file_digest(FILE_PATH)):
+        training_status(artifact["key"], artifact["model_label"])
+    
     with st.form("prediction_form", clear_on_submit=True):
         st.subheader("学生信息输入")
         col1, col2 = st.columns(2)
@@ -230,13 +241,12 @@ elif page == "成绩预测":
         submit_btn = st.form_submit_button("预测期末成绩", type="primary")
     
     if submit_btn:
-        gender_enc = 1 if gender == "男" else 0
-        major_enc = pd.factorize(major_list, sort=True)[0][major_list.index(major)]
-        input_data = pd.DataFrame({
-            "性别": [gender_enc], "专业": [major_enc], "每周学习时长（小时）": [study_hours],
+        # 按制品里保存的编码映射编码（与训练时一致）
+        input_data = encode_students(pd.DataFrame({
+            "性别": [gender], "专业": [major], "每周学习时长（小时）": [study_hours],
             "上课出勤率": [attendance], "期中考试分数": [midterm_score], "作业完成率": [homework_rate]
-        })
-        pred_score = model.predict(input_data)[0]
+        }), artifact)
+        pred_score = artifact["model"].predict(input_data)[0]
         
         st.subheader(f"预测期末成绩：{pred_score:.2f}分")
         if pred_score >= 60:
@@ -261,3 +271,20 @@ elif page == "成绩预测":
             st.warning("建议：提高上课出勤率，按时上课有助于提升成绩")
         if homework_rate < 0.85:
             st.warning("建议：保证作业完成质量，按时完成作业能巩固知识点")
+
+# ====================== 界面4：批量预测 ======================
+elif page == "批量预测":
+    if df is None:
+        st.stop()
+    st.title("全体学生批量预测")
+    st.write("一次预测全体学生（或上传的学生名单）的期末成绩，按预测成绩从低到高列出预警学生")
+    
+    metrics = artifact["metrics"]
+    st.caption(f"模型：{artifact['model_label']}｜训练数据版本 {artifact['data_hash'][:12]}｜"
+               f"{metrics['validation']}R² {metrics['r2']:.3f}")
+    if get_model_store().is_stale(artifact, file_digest(FILE_PATH)):
+        training_status(artifact["key"], artifact["model_label"])
+    # 一次 predict 全部学生；模型版本即制品键，模型切换后自动重新预测
+    batch_prediction_panel(df, file_digest(FILE_PATH), artifact["features"],
+                           predict=lambda students: artifact["model"].predict(encode_students(students, artifact)),
+                           model_version=artifact["key"])
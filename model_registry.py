@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+模型制品库（按内容寻址）
+特点：每个制品以 训练数据哈希 + 训练配置 计算键并命名，连同特征列表、编码映射和训练指标一起保存；
+数据版本对应的制品已存在时直接加载，数据变化后先继续使用旧制品（一个都没有时用快速训练的备用模型），
+并在后台线程重新训练（可查询进度），训练完成后一次性替换
+"""
+
+import glob
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import joblib
+
+# 制品目录（相对路径，和脚本同目录）
+REGISTRY_DIR = ".model_registry"
+# 每个模型保留的制品个数：当前制品 + 1个旧制品（数据回退时可直接加载）；随机森林制品可达数百MB
+KEEP_ARTIFACTS = 2
+# 制品压缩级别（0为不压缩）：压缩后随机森林制品约缩小到1/5，但加载耗时约为4倍，
+# 而请求中要直接加载与数据版本匹配的制品，所以默认不压缩
+COMPRESS_LEVEL = 0
+
+
+def artifact_key(data_hash, spec):
+    """制品键：训练数据哈希 + 训练配置（模型类型、参数、特征），任何一项变化都对应新制品"""
+    h = hashlib.sha256(data_hash.encode())
+    h.update(json.dumps(spec, sort_keys=True, ensure_ascii=False).encode())
+    return h.hexdigest()
+
+
+class ModelRegistry:
+    """
+    某个模型的全部制品：<目录>/<模型名>.<键前16位>.joblib，内容为包含模型和元数据的字典
+    keep：保留最新的几个制品；compress：joblib压缩级别（0为不压缩）
+    """
+
+    def __init__(self, name, directory=REGISTRY_DIR, keep=KEEP_ARTIFACTS, compress=COMPRESS_LEVEL):
+        self.name = name
+        self.directory = directory
+        self.keep = keep
+        self.compress = compress
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{self.name}.{key[:16]}.joblib")
+
+    def _paths(self):
+        """已有制品，最新的在前"""
+        paths = glob.glob(os.path.join(glob.escape(self.directory), glob.escape(self.name) + ".*.joblib"))
+        return sorted(paths, key=os.path.getmtime, reverse=True)
+
+    def load(self, key):
+        """按键加载制品，不存在或损坏时返回None"""
+        path = self.path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            artifact = joblib.load(path)
+        except Exception:  # 文件损坏或依赖版本不兼容
+            return None
+        return artifact if artifact.get("key") == key else None
+
+    def latest(self):
+        """最近保存的可用制品（可能基于旧数据），没有时返回None"""
+        for path in self._paths():
+            try:
+                return joblib.load(path)
+            except Exception:
+                continue
+        return None
+
+    def save(self, artifact):
+        """保存制品（先写临时文件再替换，避免其他进程读到半个文件），并清理多余的旧制品"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(artifact["key"])
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        joblib.dump(artifact, tmp_path, compress=self.compress)
+        os.replace(tmp_path, path)
+        for old in self._paths()[self.keep:]:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+        return path
+
+
+class ModelStore:
+    """
+    持有当前使用的制品：store.serve(df, data_hash) 返回与数据版本匹配的制品，
+    找不到时安排后台训练（完成后一次性替换 current），训练期间返回旧制品；一个制品都没有时返回备用模型
+    trainer(df, spec, progress) -> 字典（至少包含 model、features、metrics），由它决定特征编码方式；
+    训练中调用 progress(已完成, 总数) 报告进度
+    fallback_spec / fallback_trainer：备用模型（需要能在请求中快速训练完），不写入制品库
+    """
+
+    def __init__(self, registry, spec, trainer, fallback_spec=None, fallback_trainer=None):
+        self.registry = registry
+        self.spec = spec
+        self.trainer = trainer
+        self.fallback_spec = fallback_spec
+        self.fallback_trainer = fallback_trainer
+        self.current = None
+        self.last_error = None
+        self.progress = None
+        self._fallback = None
+        self._training_key = None
+        self._failed_key = None
+        self._lock = threading.Lock()
+
+    @property
+    def training(self):
+        """是否正在后台训练"""
+        return self._training_key is not None
+
+    def is_stale(self, artifact, data_hash):
+        """制品是否基于旧数据（或旧配置）训练"""
+        return artifact is None or artifact["key"] != artifact_key(data_hash, self.spec)
+
+    @staticmethod
+    def _build(trainer, spec, df, data_hash, progress=None):
+        """训练并补上元数据"""
+        return dict(trainer(df, spec, progress), key=artifact_key(data_hash, spec), data_hash=data_hash,
+                    spec=spec, trained_at=datetime.now().isoformat(timespec="seconds"))
+
+    def train(self, df, data_hash, progress=None):
+        """训练并保存一个新制品"""
+        artifact = self._build(self.trainer, self.spec, df, data_hash, progress)
+        try:
+            self.registry.save(artifact)
+        except OSError:
+            pass  # 目录只读时仅在内存中使用
+        return artifact
+
+    def fallback(self, df, data_hash):
+        """当前数据版本的备用模型（每个数据版本只训练一次，只保存在内存中）"""
+        with self._lock:
+            if self._fallback is None or self._fallback["data_hash"] != data_hash:
+                self._fallback = self._build(self.fallback_trainer, self.fallback_spec, df, data_hash)
+            return self._fallback
+
+    def serve(self, df, data_hash):
+        key = artifact_key(data_hash, self.spec)
+        current = self.current
+        if current is not None and current["key"] == key:
+            return current
+
+        # 1. 当前数据版本的制品已存在：直接加载
+        artifact = self.registry.load(key)
+        if artifact is not None:
+            self.current = artifact
+            return artifact
+
+        # 2. 后台训练当前数据版本的制品，训练期间先用旧制品
+        self.schedule_retrain(df, data_hash)
+        if current is not None:
+            return current
+
+        # 3. 内存中还没有制品（旧制品由后台线程从磁盘加载，不在请求中读大文件）：先用备用模型，
+        #    没有备用模型时只能同步等待旧制品加载或训练完成
+        if self.fallback_trainer is not None:
+            return self.fallback(df, data_hash)
+        while self.training and self.current is None:
+            time.sleep(0.1)
+        if self.current is None:
+            raise RuntimeError(f"模型训练失败：{self.last_error}")
+        return self.current
+
+    def schedule_retrain(self, df, data_hash):
+        """安排后台重新训练（同一数据版本只训练一次，失败后也不再重试）"""
+        key = artifact_key(data_hash, self.spec)
+        with self._lock:
+            if key in (self._training_key, self._failed_key):
+                return
+            self._training_key = key
+            self.progress = None
+        thread = threading.Thread(target=self._retrain, args=(df, data_hash, key), daemon=True)
+        thread.start()
+
+    def _retrain(self, df, data_hash, key):
+        def report(done, total):
+            if self._training_key == key:
+                self.progress = (done, total)
+
+        if self.current is None:
+            self.current = self.registry.latest()  # 训练期间先用最近的旧制品
+        try:
+            artifact = self.train(df, data_hash, progress=report)
+        except Exception as e:  # 训练失败时保留旧制品，等下次数据变化再试
+            self.last_error = e
+            self._failed_key = key
+        else:
+            self.last_error = None
+            self.current = artifact  # 引用赋值是原子的，正在运行的会话仍持有旧制品
+        finally:
+            with self._lock:
+                if self._training_key == key:
+                    self._training_key = None
+                    self.progress = None
@@ -1,11 +1,16 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+from plotly.subplots import make_subplots
 from sklearn.model_selection import train_test_split
 from sklearn.linear_model import LinearRegression
 from sklearn.metrics import r2_score
 import os  # 用于路径检查
+from data_cache import file_digest, load_table  # 共用的快照缓存加载器
+from student_stats import READER_VERSION, STUDENT_FILE, load_major_stats, read_student_excel  # 学生数据读取 + 共用的专业统计表
+from student_batch import batch_prediction_panel  # 全体学生批量预测
 
 # ===================== 全局配置 =====================
 st.set_page_config(
@@ -16,15 +21,11 @@ st.set_page_config(
 
 # 【删除了所有CSS/JS/HTML注入代码】
 
-# 加载数据（缓存避免重复读取）
+# 加载数据（缓存避免重复读取；Excel解析结果写入快照，之后冷启动直接读快照）
 @st.cache_data
 def load_data():
     try:
-        df = pd.read_excel("学生数据表.xlsx")
-        # 数据预处理：确保数值字段格式正确
-        numeric_cols = ["每周学习时长（小时）", "上课出勤率", "期中考试分数", "作业完成率", "期末考试分数"]
-        df[numeric_cols] = df[numeric_cols].apply(pd.to_numeric, errors="coerce")
-        return df
+        return load_table(STUDENT_FILE, read_student_excel, tag="mys", version=READER_VERSION)
     except FileNotFoundError:
         st.error("❌ 未找到数据文件！请将「学生数据表.xlsx」放在代码同一目录下")
         st.stop()
@@ -34,9 +35,52 @@ def load_data():
 
 df = load_data()
 
+# 各专业统计表（由已加载的明细统计，和明细快照存放在一起，学生数据表.xlsx 变化时才重新统计）
+@st.cache_data
+def load_major_data(data_version, _df):
+    return load_major_stats(_df, STUDENT_FILE, tag="mys", reader_version=READER_VERSION)
+
+# 预测模型的输入特征
+PRED_FEATURES = ["每周学习时长（小时）", "上课出勤率", "期中考试分数", "作业完成率"]
+# 各输入滑块的取值范围（最小值, 最大值, 步长），What-if 曲线在同样的范围内逐档取点
+INPUT_RANGES = {
+    "每周学习时长（小时）": (5.0, 40.0, 0.5),
+    "上课出勤率": (0.6, 1.0, 0.01),
+    "期中考试分数": (0.0, 100.0, 0.5),
+    "作业完成率": (0.7, 1.0, 0.01),
+}
+
+# 训练预测模型（逻辑完全保留；按数据版本缓存，成绩预测和批量预测共用）
+@st.cache_resource
+def train_pred_model(data_version):
+    X = df[PRED_FEATURES]
+    y = df["期末考试分数"]
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    model = LinearRegression()
+    model.fit(X_train, y_train)
+    r2 = r2_score(y_test, model.predict(X_test))
+    return model, r2
+
+# What-if 响应曲线：固定其他输入，只改变一项；4条曲线的全部取值点拼成一个矩阵，一次 predict（按输入组合缓存）
+@st.cache_data(max_entries=256)
+def what_if_curves(data_version, inputs):
+    model, _ = train_pred_model(data_version)
+    grids = [np.round(np.arange(lo, hi + step / 2, step), 4) for lo, hi, step in INPUT_RANGES.values()]
+    X = np.tile(np.asarray(inputs, dtype=float), (sum(len(grid) for grid in grids), 1))
+    start = 0
+    for j, grid in enumerate(grids):
+        X[start:start + len(grid), j] = grid
+        start += len(grid)
+    pred = model.predict(pd.DataFrame(X, columns=PRED_FEATURES))
+    return pd.DataFrame({
+        "输入": np.repeat(PRED_FEATURES, [len(grid) for grid in grids]),
+        "取值": np.concatenate(grids),
+        "预测期末成绩": pred,
+    })
+
 # ===================== 侧边栏导航 =====================
 st.sidebar.title("📑 导航菜单")
-page = st.sidebar.radio("选择功能模块", ["项目介绍", "专业数据分析", "成绩预测"])
+page = st.sidebar.radio("选择功能模块", ["项目介绍", "专业数据分析", "成绩预测", "批量预测"])
 
 # ===================== 1. 项目介绍界面 =====================
 if page == "项目介绍":
@@ -140,13 +184,9 @@ if page == "项目介绍":
 elif page == "专业数据分析":
     st.title("📚 专业数据分析")
     
-    # 1. 按专业计算核心统计指标（逻辑完全保留）
-    major_stats = df.groupby("专业").agg({
-        "每周学习时长（小时）": "mean",
-        "期中考试分数": "mean",
-        "期末考试分数": "mean",
-        "上课出勤率": "mean"
-    }).round(2).reset_index()
+    # 1. 各专业核心统计指标（取自预先统计好的专业统计表）
+    major_data = load_major_data(file_digest(STUDENT_FILE), df)
+    major_stats = major_data[["专业", "每周学习时长（小时）", "期中考试分数", "期末考试分数", "上课出勤率"]].round(2)
     major_stats.columns = ["专业", "每周平均学时", "期中平均分", "期末平均分", "平均出勤率"]
 
     # 1.1 专业核心指标表格
@@ -155,7 +195,8 @@ elif page == "专业数据分析":
 
     # 2. 专业性别比例（双层柱状图）
     st.subheader("2. 各专业男女性别比例")
-    gender_dist = df.groupby(["专业", "性别"]).size().reset_index(name="人数")
+    gender_dist = major_data[["专业", "男生人数", "女生人数"]].melt(id_vars="专业", var_name="性别", value_name="人数")
+    gender_dist["性别"] = gender_dist["性别"].str[0]  # "男生人数" -> "男"
     fig_gender = px.bar(
         gender_dist, x="专业", y="人数", color="性别",
         barmode="group", title="各专业男女生人数分布",
@@ -265,23 +306,17 @@ elif page == "成绩预测":
         gender = st.selectbox("性别", df["性别"].unique())
         major = st.selectbox("专业", df["专业"].unique())
     with col2:
-        study_hours = st.slider("每周学习时长（小时）", 5.0, 40.0, 20.0, 0.5)
-        attendance = st.slider("上课出勤率", 0.6, 1.0, 0.8, 0.01)
-        mid_score = st.slider("期中考试分数", 0.0, 100.0, 75.0, 0.5)
-        homework_rate = st.slider("作业完成率", 0.7, 1.0, 0.85, 0.01)
+        lo, hi, step = INPUT_RANGES["每周学习时长（小时）"]
+        study_hours = st.slider("每周学习时长（小时）", lo, hi, 20.0, step)
+        lo, hi, step = INPUT_RANGES["上课出勤率"]
+        attendance = st.slider("上课出勤率", lo, hi, 0.8, step)
+        lo, hi, step = INPUT_RANGES["期中考试分数"]
+        mid_score = st.slider("期中考试分数", lo, hi, 75.0, step)
+        lo, hi, step = INPUT_RANGES["作业完成率"]
+        homework_rate = st.slider("作业完成率", lo, hi, 0.85, step)
 
-    # 训练预测模型（逻辑完全保留）
-    @st.cache_resource
-    def train_pred_model():
-        X = df[["每周学习时长（小时）", "上课出勤率", "期中考试分数", "作业完成率"]]
-        y = df["期末考试分数"]
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-        model = LinearRegression()
-        model.fit(X_train, y_train)
-        r2 = r2_score(y_test, model.predict(X_test))
-        return model, r2
-
-    model, model_r2 = train_pred_model()
+    data_version = file_digest(STUDENT_FILE)
+    model, model_r2 = train_pred_model(data_version)
 
     # 预测按钮
     if st.button("🚀 开始预测", type="primary"):
@@ -321,3 +356,41 @@ elif page == "成绩预测":
         
         # 模型精度说明
         st.caption(f"📊 模型预测准确率（R²）：{model_r2:.2f}（数值越接近1，预测越准确）")
+
+    # What-if 敏感性分析（滑块变化时只多一次批量预测，同一组输入直接取缓存）
+    with st.expander("🔍 What-if 敏感性分析：其他输入不变，只改变一项时的预测成绩", expanded=True):
+        inputs = (study_hours, attendance, mid_score, homework_rate)
+        curves = what_if_curves(data_version, inputs)
+        fig_whatif = make_subplots(rows=2, cols=2, subplot_titles=PRED_FEATURES, shared_yaxes=True)
+        for i, (feature, current) in enumerate(zip(PRED_FEATURES, inputs)):
+            curve = curves[curves["输入"] == feature]
+            row, col = i // 2 + 1, i % 2 + 1
+            fig_whatif.add_trace(go.Scatter(
+                x=curve["取值"], y=curve["预测期末成绩"], mode="lines", name=feature,
+                line=dict(color="#3498db"), hovertemplate="取值：%{x}<br>预测成绩：%{y:.2f}分<extra></extra>"
+            ), row=row, col=col)
+            # 当前输入所在位置
+            current_score = np.interp(current, curve["取值"], curve["预测期末成绩"])
+            fig_whatif.add_trace(go.Scatter(
+                x=[current], y=[current_score], mode="markers", marker=dict(color="#e74c3c", size=10),
+                name="当前输入", hovertemplate="当前：%{x}<br>预测成绩：%{y:.2f}分<extra></extra>"
+            ), row=row, col=col)
+        fig_whatif.add_hline(y=60, line_dash="dash", line_color="#95a5a6", annotation_text="及格线")
+        fig_whatif.update_layout(showlegend=False, height=600)
+        st.plotly_chart(fig_whatif, use_container_width=True)
+        # 每项输入从最小值调到最大值，预测成绩的变化幅度
+        swing = curves.groupby("输入", sort=False)["预测期末成绩"].agg(lambda s: s.iloc[-1] - s.iloc[0])
+        st.caption("｜".join(f"{feature}：{value:+.2f}分" for feature, value in swing.items())
+                   + "（各项从最小值调到最大值时预测成绩的变化）")
+
+# ===================== 4. 批量预测界面 =====================
+elif page == "批量预测":
+    st.title("📋 全体学生批量预测")
+    st.write("一次预测全体学生（或上传的学生名单）的期末成绩，按预测成绩从低到高列出预警学生")
+
+    data_version = file_digest(STUDENT_FILE)
+    model, model_r2 = train_pred_model(data_version)
+    batch_prediction_panel(df, data_version, PRED_FEATURES,
+                           predict=lambda students: model.predict(students[PRED_FEATURES]),
+                           model_version=f"linear-{data_version}")
+    st.caption(f"📊 模型预测准确率（R²）：{model_r2:.2f}（线性回归）")
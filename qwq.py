@@ -11,6 +11,7 @@ import os
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder
+from data_cache import load_table
 
 # ============================ 全局配置（全相对路径，无绝对路径依赖） ============================
 st.set_page_config(page_title="企鹅分类器", page_icon="🐧", layout="wide")
@@ -71,6 +72,13 @@ def get_correct_image(species_name):
         return default_img, f"缺失{species_name}图片：{img_path}（用默认图替代）"
 
 # ============================ 核心功能函数（适配相对路径） ============================
+# 解析逻辑版本号：read_penguin_csv 改动后递增，旧快照随之失效
+READER_VERSION = 1
+
+def read_penguin_csv(path):
+    """解析数据集（gbk编码），结果写入快照，之后冷启动直接读快照"""
+    return pd.read_csv(path, encoding="gbk")
+
 def load_and_preprocess_data():
     """加载数据集（相对路径）"""
     global ACTUAL_ISLANDS
@@ -80,7 +88,7 @@ def load_and_preprocess_data():
     
     # 读取数据集（gbk编码）
     try:
-        df = pd.read_csv(DATA_PATH, encoding="gbk")
+        df = load_table(DATA_PATH, read_penguin_csv, version=READER_VERSION)
         st.success(f"✅ 成功读取数据集（相对路径：{DATA_PATH}）")
     except Exception as e:
         st.error(f"❌ 读取数据集失败：{str(e)}")
@@ -219,7 +227,7 @@ def render_intro_page():
     # 显示数据集样本（相对路径）
     if check_file_exists(DATA_PATH, "数据集"):
         try:
-            df_sample = pd.read_csv(DATA_PATH, encoding="gbk").head(5)
+            df_sample = load_table(DATA_PATH, read_penguin_csv, version=READER_VERSION).head(5)
             st.dataframe(df_sample, use_container_width=True)
         except:
             st.warning("⚠️ 无法加载数据集样本")
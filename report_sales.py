@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+销售报表批量生成（无需浏览器，用于每晚邮件）
+特点：只加载一次数据（走快照缓存），按指定维度的全部取值组合生成报表，
+各组合在进程池中并行：复用 tq.py 的指标/图表函数，每个组合输出静态HTML和JSON，另附汇总索引
+
+用法：python report_sales.py --by 城市 --output-dir reports
+     python report_sales.py --by 城市 顾客类型 --start 2022-02-01 --end 2022-02-28 --workers 4
+"""
+
+import argparse
+import html
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+
+from sales_dataset import load_sales_dataset
+from sales_filter import date_ranges
+from tq import EXCEL_PATH, READER_VERSION, format_kpis, hour_chart, product_line_chart, read_sales_workbook
+
+# 每个进程里的立方体（进程启动时传入一次，之后各任务共用）
+_cube = None
+
+
+def _init_worker(cube):
+    global _cube
+    _cube = cube
+
+
+def report_name(selection):
+    """筛选条件 -> 报表文件名（不含后缀）"""
+    if not selection:
+        return "全部"
+    return "_".join(f"{dim}={values[0]}" for dim, values in selection.items())
+
+
+def build_report(selection, date_range, data_version, output_dir, formats, plotlyjs):
+    """生成一个筛选组合的报表（在工作进程中运行），返回汇总记录"""
+    mask = _cube.mask(selection, date_ranges(date_range))
+    kpis = _cube.kpis(mask)
+    hourly = _cube.sales_by("小时数", mask)
+    products = _cube.sales_by("产品类型", mask)
+    name = report_name(selection)
+    record = {
+        "name": name,
+        "filter": selection,
+        "date_range": [d.isoformat() for d in date_range] if date_range else None,
+        "data_version": data_version,
+        "kpis": {key: (None if value != value else value) for key, value in kpis.items()},  # NaN -> null
+    }
+
+    if "json" in formats:
+        payload = dict(record,
+                       hourly_sales={int(hour): float(value) for hour, value in hourly.items()},
+                       product_sales={str(product): float(value) for product, value in products.items()})
+        with open(os.path.join(output_dir, f"{name}.json"), "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2)
+
+    if "html" in formats:
+        title = "超市销售报表 - " + ("，".join(f"{dim}：{values[0]}" for dim, values in selection.items()) or "全部")
+        charts = ""
+        if kpis["订单数"]:
+            charts = "".join(
+                fig.to_html(full_html=False, include_plotlyjs=plotlyjs if i == 0 else False)
+                for i, fig in enumerate((hour_chart(hourly), product_line_chart(products)))
+            )
+        period = f"{date_range[0]} ~ {date_range[1]}" if date_range else "全部日期"
+        page = (
+            f"<!DOCTYPE html><html lang='zh'><head><meta charset='utf-8'><title>{html.escape(title)}</title></head>"
+            f"<body><h1>📊 {html.escape(title)}</h1>"
+            f"<p>日期范围：{period}｜订单数：{kpis['订单数']:,}｜数据版本：{data_version[:12]}</p>"
+            f"<h3>{html.escape(format_kpis(kpis)) if kpis['订单数'] else '没有符合条件的订单'}</h3>"
+            f"{charts}</body></html>"
+        )
+        with open(os.path.join(output_dir, f"{name}.html"), "w", encoding="utf-8") as f:
+            f.write(page)
+    return record
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量生成销售报表（HTML/JSON）")
+    parser.add_argument("--excel", default=EXCEL_PATH, help="销售Excel路径（默认与tq.py相同）")
+    parser.add_argument("--by", nargs="*", default=["城市"], help="按哪些维度的全部取值组合生成报表（不填则只生成全部数据的报表）")
+    parser.add_argument("--start", type=date.fromisoformat, default=None, help="开始日期（YYYY-MM-DD）")
+    parser.add_argument("--end", type=date.fromisoformat, default=None, help="结束日期（YYYY-MM-DD）")
+    parser.add_argument("--output-dir", default="reports", help="报表输出目录")
+    parser.add_argument("--formats", nargs="+", choices=["html", "json"], default=["html", "json"], help="输出格式")
+    parser.add_argument("--offline", action="store_true", help="HTML内嵌plotly.js（默认从CDN加载）")
+    parser.add_argument("--workers", type=int, default=None, help="进程数（默认CPU核数）")
+    args = parser.parse_args()
+
+    # 1. 只加载一次数据
+    dataset = load_sales_dataset(args.excel, read_sales_workbook, tag="tq", reader_version=READER_VERSION)
+    cube = dataset.cube
+    date_range = None
+    if args.start or args.end:
+        if dataset.dates is None:
+            parser.error("销售数据没有日期列，不能按日期范围生成报告")
+        first, last = dataset.dates.bounds()
+        date_range = (args.start or first, args.end or last)
+
+    # 2. 全部筛选组合：整体 + 各维度取值的笛卡尔积
+    selections = [{}]
+    if args.by:
+        for values in itertools.product(*(cube.values(dim) for dim in args.by)):
+            selections.append({dim: [value] for dim, value in zip(args.by, values)})
+
+    # 3. 进程池并行生成（立方体在进程启动时传入一次）
+    os.makedirs(args.output_dir, exist_ok=True)
+    plotlyjs = True if args.offline else "cdn"
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(cube,)) as pool:
+        futures = [pool.submit(build_report, selection, date_range, dataset.version,
+                               args.output_dir, args.formats, plotlyjs) for selection in selections]
+        records = [future.result() for future in futures]
+
+    # 4. 汇总索引
+    index = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "source": os.path.basename(args.excel),
+        "data_version": dataset.version,
+        "reports": records,
+    }
+    with open(os.path.join(args.output_dir, "index.json"), "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+    if "html" in args.formats:
+        links = "".join(
+            f"<li><a href='{html.escape(r['name'])}.html'>{html.escape(r['name'])}</a>：{html.escape(format_kpis(r['kpis']))}</li>"
+            if r["kpis"]["订单数"] else f"<li>{html.escape(r['name'])}：没有符合条件的订单</li>"
+            for r in records
+        )
+        with open(os.path.join(args.output_dir, "index.html"), "w", encoding="utf-8") as f:
+            f.write(f"<!DOCTYPE html><html lang='zh'><head><meta charset='utf-8'><title>销售报表汇总</title></head>"
+                    f"<body><h1>销售报表汇总</h1><ul>{links}</ul></body></html>")
+    print(f"已生成 {len(records)} 份报表：{os.path.abspath(args.output_dir)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+城市×产品类型 的销售异常检测（稳健z分数）
+特点：按日和按小时分别把全部细分排成矩阵，每个时间点只与它之前的同类时段比较
+（按日：前8周的同一星期几；按小时：前14天的同一小时），以中位数为基准算稳健z分数，
+所有细分一次向量化计算；基准只用过去的数据，数据更新时只需计算新增（或变化）的日期。
+销售额先开平方（订单数近似泊松时方差随销售额增长，开平方后各细分、各时段的波动大致相同），
+离散程度用过去一段时间全部细分（按小时时还包括全部小时）的偏差合并估计，
+不用单个时间点只有8~14个历史值的MAD（样本太少，随机噪声就会算出很大的z分数）
+"""
+
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from sales_trend import first_changed_row
+
+# 细分维度
+SEGMENT_DIMS = ("城市", "产品类型")
+# 按日：与前8周的同一星期几比较；按小时：与前14天的同一小时比较
+DAY_LAGS = 7 * np.arange(1, 9)
+HOUR_LAGS = np.arange(1, 15)
+# 离散程度合并估计用的时间窗口（前28天的全部偏差）和至少需要的偏差个数
+SCALE_WINDOW = 28
+MIN_RESIDUALS = 30
+# 默认异常阈值（|稳健z| 超过该值视为异常）
+DEFAULT_THRESHOLD = 3.5
+
+
+def robust_z(values, lags, start=0, window=SCALE_WINDOW):
+    """
+    values[日, ...]：每个日期t与 t-lag（lag取自lags）的取值比较，返回 t>=start 部分的稳健z分数和基准中位数
+    在开平方的尺度上：偏差 = √x - 中位数(√历史)，z = 0.6745·偏差 / 前window天全部偏差绝对值的中位数；
+    历史不满一个完整窗口、基准中位数为0（数据稀疏）或前面的偏差太少时为NaN
+    """
+    lo = max(start - window, 0)  # 合并估计要用到start之前window天的偏差
+    t = np.arange(lo, len(values))
+    past = t[None, :] - lags[:, None]
+    history = values[np.clip(past, 0, None)]
+    history[past < 0] = np.nan
+    enough = (~np.isnan(history)).sum(axis=0) == len(lags)
+    with np.errstate(invalid="ignore", divide="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # 历史全为NaN的位置（开头几天）
+        median = np.nanmedian(history, axis=0)
+        median[~enough | ~(median > 0)] = np.nan
+        root_median = np.nanmedian(np.sqrt(np.clip(history, 0, None)), axis=0)
+        resid = np.sqrt(np.clip(values[lo:], 0, None)) - np.where(np.isnan(median), np.nan, root_median)
+        # 每个日期之前window天、全部细分（和小时）的偏差绝对值，合并取中位数
+        k = np.arange(len(t))[:, None] - np.arange(1, window + 1)[None, :]
+        pooled = np.abs(resid)[np.clip(k, 0, None)].reshape(len(t), -1)
+        pooled[np.repeat(k < 0, pooled.shape[1] // window, axis=1)] = np.nan
+        scale = np.nanmedian(pooled, axis=1)
+        scale[((~np.isnan(pooled)).sum(axis=1) < MIN_RESIDUALS) | ~(scale > 0)] = np.nan
+        z = 0.6745 * resid / scale.reshape((-1,) + (1,) * (values.ndim - 1))
+    return z[start - lo:], median[start - lo:]
+
+
+class SegmentAnomalies:
+    """
+    各细分的按日/按小时异常分数：
+    daily / day_z / day_median：[日, 细分]；hourly / hour_z / hour_median：[日, 小时, 细分]
+    """
+
+    def __init__(self, cube, trend, hour_col="小时数", previous=None):
+        self.days = trend.days
+        self.segments, self.daily = trend.segment_daily(SEGMENT_DIMS)
+        self.hours, self.hourly = self._hourly(cube, trend, hour_col)
+        self.hour_col = hour_col
+
+        # 与上一版本相同的日期直接复用结果，只计算之后的日期
+        keep = 0
+        if (previous is not None and len(previous.days) and len(self.days)
+                and previous.days[0] == self.days[0] and previous.segments.equals(self.segments)
+                and np.array_equal(previous.hours, self.hours)):
+            keep = min(first_changed_row(previous.daily, self.daily), first_changed_row(previous.hourly, self.hourly))
+        self.reused_days = keep
+        self.day_z, self.day_median = self._update(previous, "day", self.daily, DAY_LAGS, keep)
+        self.hour_z, self.hour_median = self._update(previous, "hour", self.hourly, HOUR_LAGS, keep)
+
+    def _hourly(self, cube, trend, hour_col):
+        """立方体单元格 -> [日, 小时, 细分] 的销售额"""
+        cells = cube.to_cells()
+        days = cells["日期"].to_numpy(dtype="datetime64[D]")
+        cells = cells[~np.isnat(days)]
+        day_idx = (cells["日期"].to_numpy(dtype="datetime64[D]") - trend.start).astype(np.int64)
+        hours = np.unique(cells[hour_col].to_numpy())
+        hour_idx = np.searchsorted(hours, cells[hour_col].to_numpy())
+        seg_idx = pd.MultiIndex.from_frame(self.segments).get_indexer(
+            pd.MultiIndex.from_frame(cells[list(SEGMENT_DIMS)]))
+        shape = (len(self.days), len(hours), len(self.segments))
+        keys = np.ravel_multi_index((day_idx, hour_idx, seg_idx), shape)
+        hourly = np.bincount(keys, weights=cells["总价"].to_numpy(dtype=float), minlength=int(np.prod(shape)))
+        return hours, hourly.reshape(shape)
+
+    @staticmethod
+    def _update(previous, level, values, lags, keep):
+        """前keep天沿用上一版本的分数，之后的日期重新计算"""
+        z, median = robust_z(values, lags, start=keep)
+        if keep:
+            z = np.concatenate([getattr(previous, f"{level}_z")[:keep], z])
+            median = np.concatenate([getattr(previous, f"{level}_median")[:keep], median])
+        return z, median
+
+    def flags(self, level="日", threshold=DEFAULT_THRESHOLD):
+        """超过阈值的异常记录（按 |z| 从大到小），level为 "日" 或 "小时" """
+        if level == "日":
+            z, values, median = self.day_z, self.daily, self.day_median
+        else:
+            z, values, median = self.hour_z, self.hourly, self.hour_median
+        with np.errstate(invalid="ignore"):
+            hits = np.argwhere(np.abs(z) >= threshold)
+        result = self.segments.iloc[hits[:, -1]].reset_index(drop=True)
+        result["日期"] = self.days[hits[:, 0]].astype("datetime64[ns]")
+        if level != "日":
+            result["小时"] = self.hours[hits[:, 1]]
+        index = tuple(hits.T)
+        result["销售额"] = values[index]
+        result["基准（中位数）"] = median[index]
+        result["稳健z分数"] = z[index]
+        result["方向"] = np.where(z[index] > 0, "偏高", "偏低")
+        return result.sort_values("稳健z分数", key=np.abs, ascending=False, ignore_index=True)
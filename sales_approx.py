@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+销售指标近似计算（分层抽样 + 置信区间）
+特点：加载时按 城市×顾客类型×性别 分层抽样，每层只保留均值/方差等汇总量；
+筛选后的 总销售额 / 平均评分 / 每单平均销售额 由各层汇总量加权估计并给出95%置信区间，
+带日期区间时按样本行号做域估计；需要精确值时提交到后台线程计算，不阻塞当前页面
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import streamlit as st
+
+# 分层维度（与筛选器一致，每一层要么整体选中要么整体不选，估计无偏）
+STRATA_DIMS = ("城市", "顾客类型", "性别")
+# 95%置信区间的z值
+Z_95 = 1.96
+
+# 精确计算的后台线程池（所有会话共用）
+_exact_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="exact-kpi")
+
+
+class StratifiedSample:
+    """分层样本：每层抽样率相同，且每层至少 min_per_stratum 行（不足时整层保留）"""
+
+    def __init__(self, df, sample_rows=20_000, min_per_stratum=30, dims=STRATA_DIMS, seed=42):
+        rng = np.random.default_rng(seed)
+        self.dims = list(dims)
+        grouped = df.groupby(self.dims, observed=True, sort=True)
+        codes = grouped.ngroup().to_numpy()
+        self.strata = grouped.size().index.to_frame(index=False)
+        n_strata = len(self.strata)
+        rate = min(1.0, sample_rows / max(len(df), 1))
+
+        sales = df["总价"].to_numpy(dtype=float)
+        rating = df["评分"].to_numpy(dtype=float)
+        order = np.argsort(codes, kind="stable")
+        bounds = np.searchsorted(codes[order], np.arange(n_strata + 1))
+        stats, sampled = [], []
+        for h in range(n_strata):
+            rows = order[bounds[h]:bounds[h + 1]]
+            n_total = len(rows)
+            n_sample = min(n_total, max(min_per_stratum, int(np.ceil(n_total * rate))))
+            picked = rng.choice(rows, size=n_sample, replace=False)
+            sampled.append(picked)
+            stats.append((
+                n_total, n_sample,
+                sales[picked].mean(), sales[picked].var(ddof=1) if n_sample > 1 else 0.0,
+                rating[picked].mean(), rating[picked].var(ddof=1) if n_sample > 1 else 0.0,
+            ))
+        stats = np.array(stats, dtype=float).reshape(-1, 6)
+        self.n_total, self.n_sample = stats[:, 0], stats[:, 1]
+        self.sales_mean, self.sales_var = stats[:, 2], stats[:, 3]
+        self.rating_mean, self.rating_var = stats[:, 4], stats[:, 5]
+        # 样本行本身（行号、所属层、取值），用于日期区间等不按层划分的筛选
+        self.rows = np.concatenate(sampled) if sampled else np.zeros(0, dtype=np.int64)
+        self.row_strata = np.repeat(np.arange(n_strata), self.n_sample.astype(np.int64))
+        self.row_sales, self.row_rating = sales[self.rows], rating[self.rows]
+
+    def estimate(self, selection=None, row_range=None):
+        """
+        估计筛选后的核心指标，返回 {指标: (估计值, 95%置信区间半宽)}
+        row_range为None时订单数为精确值；给出行区间（日期区间）时改用域估计，订单数也是估计值
+        """
+        mask = np.ones(len(self.strata), dtype=bool)
+        for dim, chosen in (selection or {}).items():
+            if dim in self.dims:
+                mask &= self.strata[dim].isin(list(chosen)).to_numpy()
+        if row_range is not None:
+            return self._estimate_domain(mask, row_range)
+        big_n, small_n = self.n_total[mask], self.n_sample[mask]
+        count = big_n.sum()
+        if count == 0:
+            return {"总销售额": (0.0, 0.0), "平均评分": (np.nan, np.nan),
+                    "每单平均销售额": (np.nan, np.nan), "订单数": 0}
+
+        # 分层估计：总量 = Σ N_h·均值_h，方差 = Σ N_h²·(1 - n_h/N_h)·s_h²/n_h
+        fpc = 1 - small_n / big_n
+        total = (big_n * self.sales_mean[mask]).sum()
+        total_se = np.sqrt((big_n ** 2 * fpc * self.sales_var[mask] / small_n).sum())
+        rating = (big_n * self.rating_mean[mask]).sum() / count
+        rating_se = np.sqrt((big_n ** 2 * fpc * self.rating_var[mask] / small_n).sum()) / count
+        return {
+            "总销售额": (total, Z_95 * total_se),
+            "平均评分": (rating, Z_95 * rating_se),
+            "每单平均销售额": (total / count, Z_95 * total_se / count),
+            "订单数": int(count),
+        }
+
+    def _estimate_domain(self, mask, row_range):
+        """
+        行区间内的域估计：区间外的样本取值记为0，总量用分层估计；
+        均值是两个总量之比，方差用线性化残差 y - R·1[区间内] 计算
+        """
+        start, stop = row_range
+        n_strata = len(self.strata)
+        keep = mask[self.row_strata]
+        strata, rows = self.row_strata[keep], self.rows[keep]
+        inside = ((rows >= start) & (rows < stop)).astype(float)
+        sales, rating = self.row_sales[keep] * inside, self.row_rating[keep] * inside
+        big_n, small_n = self.n_total, self.n_sample
+        fpc = 1 - small_n / big_n
+
+        def total_and_se(values):
+            sums = np.bincount(strata, weights=values, minlength=n_strata)
+            squares = np.bincount(strata, weights=values ** 2, minlength=n_strata)
+            means = sums / small_n
+            var = np.where(small_n > 1, np.clip(squares - small_n * means ** 2, 0, None) / np.maximum(small_n - 1, 1), 0.0)
+            total = (big_n * means)[mask].sum()
+            se = np.sqrt((big_n ** 2 * fpc * var / small_n)[mask].sum())
+            return total, se
+
+        count, _ = total_and_se(inside)
+        if count <= 0:
+            return {"总销售额": (0.0, 0.0), "平均评分": (np.nan, np.nan),
+                    "每单平均销售额": (np.nan, np.nan), "订单数": 0}
+        total, total_se = total_and_se(sales)
+        rating_total, _ = total_and_se(rating)
+        avg_sales, avg_rating = total / count, rating_total / count
+        _, avg_sales_se = total_and_se(sales - avg_sales * inside)
+        _, avg_rating_se = total_and_se(rating - avg_rating * inside)
+        return {
+            "总销售额": (total, Z_95 * total_se),
+            "平均评分": (avg_rating, Z_95 * avg_rating_se / count),
+            "每单平均销售额": (avg_sales, Z_95 * avg_sales_se / count),
+            "订单数": int(round(count)),
+        }
+
+
+def exact_kpis(df, rows):
+    """按行号对明细精确计算核心指标"""
+    sales = df["总价"].to_numpy(dtype=float)[rows]
+    rating = df["评分"].to_numpy(dtype=float)[rows]
+    count = len(rows)
+    return {
+        "总销售额": float(sales.sum()),
+        "平均评分": float(rating.mean()) if count else np.nan,
+        "每单平均销售额": float(sales.mean()) if count else np.nan,
+        "订单数": count,
+    }
+
+
+def submit_exact(df, rows):
+    """在后台线程精确计算，返回Future（结果为 exact_kpis 的字典）"""
+    return _exact_pool.submit(exact_kpis, df, rows)
+
+
+def exact_kpi_panel(df, engine, selection, format_result, row_range=None):
+    """
+    近似模式下的精确值面板：点击后把精确计算提交到后台线程，完成后自动刷新页面显示
+    format_result：精确指标字典 -> 展示文字；row_range：日期区间对应的行区间
+    """
+    job_key = repr((sorted((dim, sorted(values)) for dim, values in selection.items()), row_range))
+    if st.button("🎯 后台计算精确值", key="exact_kpi_button"):
+        st.session_state["exact_job"] = (job_key, submit_exact(df, engine.select(selection, row_range)))
+
+    job = st.session_state.get("exact_job")
+    if job is None or job[0] != job_key:
+        return  # 没有提交过，或筛选条件已变化
+    if job[1].done():
+        st.success(f"精确值：{format_result(job[1].result())}")
+    else:
+        _wait_exact_job(job[1])
+
+
+@st.fragment(run_every="1s")
+def _wait_exact_job(future):
+    """每秒检查一次后台任务，完成后整页刷新（只有这个小片段在轮询）"""
+    if future.done():
+        st.rerun()
+    st.info("⏳ 正在后台计算精确值，可以继续操作页面...")
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+超市销售数据立方体
+特点：加载时按 城市×顾客类型×性别×小时×产品类型（×日期） 预聚合一次（销售额合计、订单数、评分合计），
+之后每次筛选只需对少量单元格求和，筛选耗时与明细行数无关；
+单元格按日期排序存放，日期区间二分查找后对应一段连续单元格，只需处理这一段
+"""
+
+import numpy as np
+import pandas as pd
+
+# 默认维度（小时列名各应用不同：tq为"小时数"，tw为"时间_小时"）
+DEFAULT_DIMS = ("城市", "顾客类型", "性别", "小时数", "产品类型")
+# 区间维度：取值按升序编码，缺失值单独作为最后一个取值保留（只有按该维度的区间筛选会排除它），
+# 单元格按它排序存放；其他维度为空值的行不参与聚合
+RANGE_DIM = "日期"
+
+
+class SalesCube:
+    """销售数据立方体：每个单元格对应一种维度取值组合"""
+
+    def __init__(self, df, dims=DEFAULT_DIMS, cells=False):
+        """
+        df：明细行（含总价、评分列）；
+        cells=True 时df为已聚合的单元格（含总价、订单数、评分合计列，见 to_cells），用于合并分块聚合结果
+        """
+        self.dims = list(dims)
+        self.labels = {}
+
+        # 1. 各维度编码（保持首次出现顺序，和 unique() 一致；区间维度按升序，缺失值在最后）
+        codes = {}
+        for dim in self.dims:
+            is_range = dim == RANGE_DIM
+            dim_codes, uniques = pd.factorize(df[dim], sort=is_range, use_na_sentinel=not is_range)
+            self.labels[dim] = np.asarray(uniques)
+            codes[dim] = dim_codes
+        valid = np.all([c >= 0 for c in codes.values()], axis=0)  # 维度为空值的行不参与聚合
+
+        # 2. 组合键 -> 单元格，一次 bincount 完成三项聚合；区间维度作为组合键的最高位，单元格按它排序
+        order = sorted(self.dims, key=lambda dim: dim != RANGE_DIM)
+        shape = tuple(len(self.labels[dim]) for dim in order)
+        keys = np.ravel_multi_index([codes[dim][valid] for dim in order], shape)
+        cell_keys, inverse = np.unique(keys, return_inverse=True)
+        n_cells = len(cell_keys)
+        rating = df["评分合计" if cells else "评分"].to_numpy(dtype=float)[valid]
+        count_weights = df["订单数"].to_numpy(dtype=float)[valid] if cells else None
+        self.sales = np.bincount(inverse, weights=df["总价"].to_numpy(dtype=float)[valid], minlength=n_cells)
+        self.rating_sum = np.bincount(inverse, weights=rating, minlength=n_cells)
+        self.count = np.bincount(inverse, weights=count_weights, minlength=n_cells).astype(np.int64)
+        self.codes = dict(zip(order, np.unravel_index(cell_keys, shape)))
+
+        # 3. 区间维度各取值的第一个单元格（末尾追加单元格总数），取值区间二分查找后对应一段连续单元格
+        self.range_offsets = None
+        if RANGE_DIM in self.labels:
+            labels = self.labels[RANGE_DIM]
+            self.n_range_values = int((~pd.isna(labels)).sum())  # 不含缺失值
+            self.range_offsets = np.searchsorted(self.codes[RANGE_DIM], np.arange(len(labels) + 1))
+
+    def __len__(self):
+        return len(self.sales)
+
+    def to_cells(self):
+        """导出单元格表：各维度取值 + 总价、订单数、评分合计"""
+        cells = {dim: self.labels[dim][self.codes[dim]] for dim in self.dims}
+        cells.update({"总价": self.sales, "订单数": self.count, "评分合计": self.rating_sum})
+        return pd.DataFrame(cells)
+
+    def values(self, dim):
+        """某维度的全部取值（用于筛选器选项）"""
+        return self.labels[dim].tolist()
+
+    def mask(self, selection=None, ranges=None):
+        """
+        筛选条件 -> 选中的单元格编号（升序，和布尔掩码一样用于索引单元格数组）
+        selection：{维度: 选中取值列表}，未出现的维度不筛选
+        ranges：{维度: (下限, 上限)}，只保留取值在闭区间内的单元格（如日期范围；缺失日期不在任何区间内）
+        日期区间先二分查找到一段连续单元格，之后只处理这一段，耗时与区间内的单元格数成正比
+        """
+        start, stop = self.cell_span(ranges)
+        part = np.ones(stop - start, dtype=bool)
+        for dim, chosen in (selection or {}).items():
+            allowed = np.isin(self.labels[dim], list(chosen))
+            part &= allowed[self.codes[dim][start:stop]]
+        for dim, (low, high) in (ranges or {}).items():
+            if dim != RANGE_DIM:
+                labels = self.labels[dim]
+                allowed = (labels >= low) & (labels <= high)
+                part &= allowed[self.codes[dim][start:stop]]
+        return np.flatnonzero(part) + start
+
+    def cell_span(self, ranges=None):
+        """区间维度的取值区间（含两端）-> (起始单元格, 结束单元格)，O(log n)；没有该区间条件时为全部单元格"""
+        if not ranges or RANGE_DIM not in ranges or self.range_offsets is None:
+            return 0, len(self)
+        low, high = ranges[RANGE_DIM]
+        labels = self.labels[RANGE_DIM][:self.n_range_values]
+        lo = np.searchsorted(labels, low, side="left")
+        hi = np.searchsorted(labels, high, side="right")
+        return int(self.range_offsets[lo]), int(self.range_offsets[max(hi, lo)])
+
+    def kpis(self, mask):
+        """核心指标：总销售额、平均评分、每单平均销售额、订单数"""
+        count = int(self.count[mask].sum())
+        total_sales = float(self.sales[mask].sum())
+        rating_sum = float(self.rating_sum[mask].sum())
+        return {
+            "总销售额": total_sales,
+            "平均评分": rating_sum / count if count else np.nan,
+            "每单平均销售额": total_sales / count if count else np.nan,
+            "订单数": count,
+        }
+
+    def sales_by(self, dim, mask):
+        """按某维度汇总销售额（只保留有订单的取值，按取值排序，等价于 groupby(dim)["总价"].sum()）"""
+        n_labels = len(self.labels[dim])
+        codes = self.codes[dim][mask]
+        sales = np.bincount(codes, weights=self.sales[mask], minlength=n_labels)
+        present = np.bincount(codes, weights=self.count[mask], minlength=n_labels) > 0
+        result = pd.Series(sales[present], index=pd.Index(self.labels[dim][present], name=dim), name="总价")
+        return result.sort_index()
+
+    def compare(self, masks, by=()):
+        """
+        多组筛选条件一次聚合（各组可以重叠）：masks为 {分组名: mask() 返回的单元格编号}
+        分组×单元格 的0/1矩阵与单元格度量相乘，所有分组的指标和按维度汇总一起得到
+        返回 (核心指标DataFrame（行=分组）, {维度: 销售额DataFrame（行=维度取值, 列=分组）})
+        """
+        names = list(masks)
+        member = np.zeros((len(names), len(self)))
+        for i, name in enumerate(names):
+            member[i, masks[name]] = 1.0
+        sales, rating_sum, count = (member @ np.column_stack([self.sales, self.rating_sum, self.count])).T
+        with np.errstate(invalid="ignore", divide="ignore"):
+            kpis = pd.DataFrame({
+                "总销售额": sales,
+                "平均评分": np.where(count > 0, rating_sum / count, np.nan),
+                "每单平均销售额": np.where(count > 0, sales / count, np.nan),
+                "订单数": count.astype(np.int64),
+            }, index=pd.Index(names, name="分组"))
+
+        breakdowns = {}
+        for dim in by:
+            n_labels = len(self.labels[dim])
+            # 单元格 -> 维度取值 的销售额矩阵（每行只有一个非零值）
+            spread = np.zeros((len(self), n_labels))
+            spread[np.arange(len(self)), self.codes[dim]] = self.sales
+            orders = np.zeros((len(self), n_labels))
+            orders[np.arange(len(self)), self.codes[dim]] = self.count
+            present = (member @ orders).sum(axis=0) > 0
+            table = pd.DataFrame((member @ spread)[:, present].T, columns=pd.Index(names, name="分组"),
+                                 index=pd.Index(self.labels[dim][present], name=dim))
+            breakdowns[dim] = table.sort_index()
+        return kpis, breakdowns
+
+
+def merge_cubes(cubes, dims=DEFAULT_DIMS):
+    """合并多个维度相同的立方体（如各数据分块的部分聚合结果）；没有可合并的立方体时返回按dims建立的空立方体"""
+    cubes = list(cubes)
+    if not cubes:
+        empty = pd.DataFrame({col: [] for col in [*dims, "总价", "订单数", "评分合计"]})
+        return SalesCube(empty, dims=dims, cells=True)
+    cells = pd.concat([cube.to_cells() for cube in cubes], ignore_index=True)
+    return SalesCube(cells, dims=cubes[0].dims, cells=True)
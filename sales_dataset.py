@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+进程内共享的只读销售数据集
+特点：每个数据版本在服务进程内只加载一份（明细来自内存映射的Arrow快照），
+连同立方体、位图索引、分层样本一起打包，所有浏览器会话共用；
+会话只保存自己的筛选条件和行号视图，新增访问者几乎不增加内存；
+源文件被替换时由后台线程重新加载并原子替换，用户请求不承担加载耗时
+"""
+
+import os
+import threading
+
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+from data_cache import file_digest, load_table
+from sales_anomaly import SegmentAnomalies
+from sales_approx import StratifiedSample
+from sales_cube import SalesCube
+from sales_filter import FILTER_DIMS, DateIndex, FilterEngine
+from sales_lattice import CuboidLattice
+from sales_trend import DailyTrend
+
+
+class SalesDataset:
+    """
+    一个数据版本的只读数据集（约定：任何会话都不修改其中的对象）
+    - version：数据版本（源文件内容哈希）
+    - df：明细数据（有日期列时按日期升序存放），历史数据模式下为None
+    - cube / engine / sample：立方体、位图筛选引擎、分层样本
+    - dates / trend / anomalies：日期偏移索引、每日销售趋势、细分异常分数，没有日期列时为None
+    - lattice：透视分析用的聚合格（由立方体物化的各维度组合）
+    previous：上一版本的数据集（数据更新时复用其中未变化的部分）
+    """
+
+    def __init__(self, version, df=None, hour_col="小时数", cube=None, previous=None):
+        self.version = version
+        self.df = df
+        self.hour_col = hour_col
+        self._sort_orders = {}
+        if df is None:
+            # 只有聚合结果（如分块流式聚合的历史数据）
+            self.cube, self.engine, self.sample = cube, None, None
+            self.dates = self.trend = self.anomalies = None
+            self.lattice = CuboidLattice(cube)
+            return
+        dims = ("城市", "顾客类型", "性别", hour_col, "产品类型")
+        self.dates = self.trend = self.anomalies = None
+        if "日期" in df.columns:
+            # 日期区间 -> 连续行号区间，要求明细按日期排序（读取函数已排序时这里不会复制）
+            if not df["日期"].is_monotonic_increasing:
+                self.df = df = df.sort_values("日期", kind="stable", na_position="last")
+            self.dates = DateIndex(df["日期"])
+            dims += ("日期",)
+        self.cube = SalesCube(df, dims=dims)
+        self.engine = FilterEngine(df)
+        self.sample = StratifiedSample(df)
+        if self.dates is not None:
+            self.trend = DailyTrend(self.cube, previous=getattr(previous, "trend", None))
+            self.anomalies = SegmentAnomalies(self.cube, self.trend, hour_col,
+                                              previous=getattr(previous, "anomalies", None))
+        self.lattice = CuboidLattice(self.cube)
+
+    def options(self, dim):
+        """筛选器选项（按首次出现顺序）"""
+        return self.cube.values(dim)
+
+    def sort_order(self, col):
+        """按某列升序排列的全表行号（首次用到时计算，之后所有会话共用；缺失值排在最后）"""
+        order = self._sort_orders.get(col)
+        if order is None:
+            values = self.df[col].reset_index(drop=True)
+            order = values.sort_values(kind="stable", na_position="last").index.to_numpy()
+            self._sort_orders[col] = order
+        return order
+
+
+def load_sales_dataset(path, reader, tag, hour_col="小时数", previous=None, reader_version=1):
+    """从快照缓存加载明细并构建数据集（筛选维度列统一为分类类型）；reader_version：解析函数版本号，改动解析逻辑后递增"""
+    version = file_digest(path)
+    df = load_table(path, reader, tag=tag, dtypes={col: "category" for col in FILTER_DIMS}, version=reader_version)
+    return SalesDataset(version, df, hour_col=hour_col, previous=previous)
+
+
+class SalesStore:
+    """
+    持有当前版本的数据集：store.current 始终是一个完整可用的 SalesDataset
+    - 每次脚本运行开头取一次 store.current，运行期间一直使用这个版本（旧版本由引用计数自然释放）
+    - watch() 后台监听源文件，文件变化时重新加载，加载完成后一次性替换 current
+    """
+
+    # 文件变化后等待片刻再加载（Excel保存会连续触发多个事件，且可能还没写完）
+    RELOAD_DELAY = 1.0
+
+    def __init__(self, path, reader, tag, hour_col="小时数", reader_version=1):
+        self.path = os.path.abspath(path)
+        self.reader = reader
+        self.tag = tag
+        self.hour_col = hour_col
+        self.reader_version = reader_version
+        self.last_error = None
+        self.current = load_sales_dataset(self.path, reader, tag, hour_col, reader_version=reader_version)
+        self._reload_lock = threading.Lock()
+        self._timer = None
+        self._observer = None
+
+    def reload(self):
+        """重新加载源文件（内容没变时跳过）；失败时保留旧版本，等下次文件变化再试"""
+        with self._reload_lock:
+            try:
+                if file_digest(self.path) == self.current.version:
+                    return
+                dataset = load_sales_dataset(self.path, self.reader, self.tag, self.hour_col,
+                                             previous=self.current, reader_version=self.reader_version)
+            except Exception as e:  # 文件可能正在写入或格式有误
+                self.last_error = e
+                return
+            self.last_error = None
+            self.current = dataset  # 引用赋值是原子的，正在运行的会话仍持有旧版本
+
+    def _schedule_reload(self):
+        """防抖：短时间内的多个文件事件只触发一次重新加载"""
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(self.RELOAD_DELAY, self.reload)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def watch(self):
+        """启动后台文件监听（监听所在目录，覆盖"写临时文件再改名"的保存方式）"""
+        if self._observer is not None:
+            return self
+        store = self
+
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                paths = (event.src_path, getattr(event, "dest_path", ""))
+                if any(p and os.path.abspath(p) == store.path for p in paths):
+                    store._schedule_reload()
+
+        self._observer = Observer()
+        self._observer.daemon = True
+        self._observer.schedule(_Handler(), os.path.dirname(self.path), recursive=False)
+        self._observer.start()
+        return self
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+筛选后明细的流式导出（CSV / gzip压缩CSV / Parquet）
+特点：按行号分块取出明细，每块写完即丢弃，不生成完整的筛选副本或整段CSV字符串；
+写到应用专用的导出目录，点击下载时才读取文件内容（超过单条消息上限的文件不提供浏览器下载）；导出时报告每秒行数；
+导出目录由所有会话共用：超时或超出个数的旧文件在每次导出前清理，进程退出时删除本进程生成的文件
+"""
+
+import atexit
+import gzip
+import os
+import tempfile
+import threading
+import time
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import streamlit as st
+
+# 导出格式：名称 -> (文件后缀, MIME类型)
+EXPORT_FORMATS = {
+    "CSV": (".csv", "text/csv"),
+    "CSV（gzip压缩）": (".csv.gz", "application/gzip"),
+    "Parquet": (".parquet", "application/vnd.apache.parquet"),
+}
+# 每块行数
+CHUNK_ROWS = 50_000
+# 导出目录（所有会话共用）、最多保留的导出文件数、导出文件最长保留时间（秒）
+EXPORT_DIR = os.path.join(tempfile.gettempdir(), "sales_exports")
+MAX_EXPORT_FILES = 20
+MAX_EXPORT_AGE = 3600
+
+# 本进程生成的导出文件（进程退出时删除）
+_own_files = set()
+_own_files_lock = threading.Lock()
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+    with _own_files_lock:
+        _own_files.discard(path)
+
+
+def prune_exports(keep=MAX_EXPORT_FILES, max_age=MAX_EXPORT_AGE):
+    """清理导出目录：超过max_age秒的文件全部删除，其余只保留最新的keep个"""
+    try:
+        entries = [entry for entry in os.scandir(EXPORT_DIR) if entry.is_file()]
+    except OSError:
+        return
+    now = time.time()
+    entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for i, entry in enumerate(entries):
+        if i >= keep or now - entry.stat().st_mtime > max_age:
+            _remove(entry.path)
+
+
+def new_export_path(suffix):
+    """在导出目录中新建一个导出文件（先清理旧文件，为新文件留出位置）"""
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    prune_exports(keep=MAX_EXPORT_FILES - 1)
+    fd, path = tempfile.mkstemp(suffix=suffix, prefix="sales_export_", dir=EXPORT_DIR)
+    os.close(fd)
+    with _own_files_lock:
+        _own_files.add(path)
+    return path
+
+
+@atexit.register
+def _remove_own_exports():
+    for path in list(_own_files):
+        _remove(path)
+
+
+def iter_row_chunks(df, rows, chunk_rows=CHUNK_ROWS):
+    """按行号分块取出明细（每次只复制一块）"""
+    for start in range(0, len(rows), chunk_rows):
+        yield df.iloc[rows[start:start + chunk_rows]]
+
+
+def export_rows(df, rows, fmt, path, chunk_rows=CHUNK_ROWS, progress=None):
+    """
+    把df中rows对应的行分块写到path，返回用时（秒）
+    progress：每写完一块调用 progress(已写行数, 已用秒数)
+    """
+    start_time = time.perf_counter()
+    written = 0
+
+    def report(chunk):
+        nonlocal written
+        written += len(chunk)
+        if progress is not None:
+            progress(written, time.perf_counter() - start_time)
+
+    if fmt == "Parquet":
+        writer = None
+        try:
+            for chunk in iter_row_chunks(df, rows, chunk_rows):
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+                report(chunk)
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is None:  # 没有数据时也写出只含表头的文件
+            pq.write_table(pa.Table.from_pandas(df.iloc[:0], preserve_index=False), path)
+    else:
+        opener = gzip.open if fmt == "CSV（gzip压缩）" else open
+        # utf-8-sig：Excel打开中文CSV不乱码
+        with opener(path, "wt", encoding="utf-8-sig", newline="") as f:
+            df.iloc[:0].to_csv(f, index=False)
+            for chunk in iter_row_chunks(df, rows, chunk_rows):
+                chunk.to_csv(f, index=False, header=False)
+                report(chunk)
+    return time.perf_counter() - start_time
+
+
+def export_panel(df, rows, job_key, file_stem="销售数据"):
+    """
+    导出面板：选择格式后生成导出文件（进度条显示每秒行数），生成后提供下载按钮
+    job_key：筛选条件的标识，条件变化后需要重新生成
+    """
+    fmt = st.selectbox("导出格式：", list(EXPORT_FORMATS), key="export_format")
+    suffix, mime = EXPORT_FORMATS[fmt]
+    job_key = (job_key, fmt)
+
+    if st.button(f"📦 生成导出文件（{len(rows):,} 行）", key="export_button"):
+        previous = st.session_state.pop("export_file", None)
+        if previous is not None:
+            _remove(previous[1])  # 同一会话只保留最新的导出文件
+        path = new_export_path(suffix)
+        bar = st.progress(0.0, text="正在导出...")
+
+        def progress(written, seconds):
+            bar.progress(written / max(len(rows), 1),
+                         text=f"已导出 {written:,} / {len(rows):,} 行（{written / max(seconds, 1e-9):,.0f} 行/秒）")
+
+        seconds = export_rows(df, rows, fmt, path, progress=progress)
+        bar.empty()
+        st.session_state["export_file"] = (job_key, path, len(rows), seconds)
+
+    export = st.session_state.get("export_file")
+    if export is None or export[0] != job_key or not os.path.exists(export[1]):
+        return  # 还没生成，或筛选条件/格式已变化
+    _, path, n_rows, seconds = export
+    size = os.path.getsize(path)
+    st.success(f"已导出 {n_rows:,} 行，用时 {seconds:.2f} 秒（{n_rows / max(seconds, 1e-9):,.0f} 行/秒），"
+               f"文件大小 {size / 1024:,.1f} KB")
+    # 下载时整个文件要读入内存并作为一条消息发送，超过上限时不提供下载
+    max_mb = st.get_option("server.maxMessageSize")
+    if size > max_mb * 1024 * 1024:
+        st.warning(f"⚠️ 导出文件超过 {max_mb} MB，无法通过浏览器下载，请缩小筛选范围或改用 CSV（gzip压缩）/ Parquet 格式")
+        return
+
+    def read_file():
+        with open(path, "rb") as f:
+            return f.read()
+
+    # 点击下载时才读取文件内容，不在每次页面刷新时加载
+    st.download_button("⬇️ 下载", data=read_file, file_name=f"{file_stem}{suffix}",
+                       mime=mime, on_click="ignore", key="export_download")
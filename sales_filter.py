@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+超市销售数据筛选引擎（位图索引）
+特点：城市/顾客类型/性别/产品类型按分类编码，每个取值预先建一张行位图；
+筛选时同一维度内按位或、不同维度间按位与，返回行号而不是复制一份DataFrame；
+明细按日期升序存放时，日期区间经二分查找对应一段连续行号，只需处理这一段的位图
+"""
+
+import numpy as np
+import pandas as pd
+
+# 建位图索引的维度列
+FILTER_DIMS = ("城市", "顾客类型", "性别", "产品类型")
+
+
+class FilterEngine:
+    """位图筛选引擎：bitmaps[维度][取值] 为按位压缩的行位图（每行1位）"""
+
+    def __init__(self, df, dims=FILTER_DIMS):
+        self.n_rows = len(df)
+        self.codes = {}
+        self.bitmaps = {}
+        for dim in dims:
+            # 分类编码（已是category类型时直接复用编码）
+            cat = df[dim].astype("category").cat
+            codes = cat.codes.to_numpy()
+            self.codes[dim] = codes
+            self.bitmaps[dim] = {
+                value: np.packbits(codes == i) for i, value in enumerate(cat.categories)
+            }
+
+    def _span(self, row_range):
+        """行区间 -> (起始行, 结束行, 起始字节, 结束字节)，None表示全部行"""
+        start, stop = row_range if row_range is not None else (0, self.n_rows)
+        return start, stop, start // 8, (stop + 7) // 8
+
+    def bitmap(self, selection=None, row_range=None):
+        """
+        筛选条件 -> 行位图
+        selection：{维度: 选中取值列表}，未出现的维度不筛选；返回None表示全部行
+        row_range：(起始行, 结束行)，只取覆盖这段行的字节（从 起始行//8*8 开始），耗时与区间长度成正比
+        """
+        _, _, byte_start, byte_stop = self._span(row_range)
+        result = None
+        for dim, chosen in (selection or {}).items():
+            dim_bits = np.zeros(byte_stop - byte_start, dtype=np.uint8)
+            for value in chosen:
+                value_bits = self.bitmaps[dim].get(value)
+                if value_bits is not None:
+                    dim_bits |= value_bits[byte_start:byte_stop]
+            result = dim_bits if result is None else result & dim_bits
+        return result
+
+    def select(self, selection=None, row_range=None):
+        """筛选条件（+行区间） -> 行号数组（升序），配合 df.iloc / take 按需取列"""
+        start, stop, byte_start, _ = self._span(row_range)
+        bits = self.bitmap(selection, row_range)
+        if bits is None:
+            return np.arange(start, stop)
+        offset = byte_start * 8
+        rows = np.unpackbits(bits)[start - offset:stop - offset]
+        return np.flatnonzero(rows) + start
+
+    def count(self, selection=None, row_range=None):
+        """筛选后的行数（直接数位图里的1，不展开行号）"""
+        start, stop, byte_start, _ = self._span(row_range)
+        bits = self.bitmap(selection, row_range)
+        if bits is None:
+            return stop - start
+        if row_range is None:
+            return int(np.bitwise_count(bits).sum())
+        offset = byte_start * 8
+        return int(np.count_nonzero(np.unpackbits(bits)[start - offset:stop - offset]))
+
+
+class DateIndex:
+    """
+    日期偏移索引（要求明细已按日期升序存放，缺失日期排在最后）
+    days为各不同日期，offsets[i]为days[i]的第一行行号，任意日期区间二分查找后对应一段连续行号
+    """
+
+    def __init__(self, dates):
+        days = pd.to_datetime(dates).to_numpy(dtype="datetime64[D]")
+        self.n_rows = len(days)
+        valid = ~np.isnat(days)
+        self.days, first_rows = np.unique(days[valid], return_index=True)
+        # 末尾追加"结束行"：最后一个有效日期之后（缺失日期不属于任何区间）
+        self.offsets = np.append(first_rows, int(valid.sum()))
+
+    def bounds(self):
+        """数据覆盖的日期范围 (最早日期, 最晚日期)"""
+        return self.days[0].item(), self.days[-1].item()
+
+    def row_range(self, start, end):
+        """日期区间（含两端）-> (起始行, 结束行)，O(log n)；覆盖全部行时返回None"""
+        lo = np.searchsorted(self.days, np.datetime64(start, "D"), side="left")
+        hi = np.searchsorted(self.days, np.datetime64(end, "D"), side="right")
+        rows = int(self.offsets[lo]), int(self.offsets[hi])
+        return None if rows == (0, self.n_rows) else rows
+
+
+def date_ranges(date_range):
+    """日期范围 (开始日期, 结束日期) -> 立方体区间筛选条件（SalesCube.mask 的 ranges），None表示全部日期"""
+    if date_range is None:
+        return None
+    return {"日期": (np.datetime64(date_range[0]), np.datetime64(date_range[1]))}
+
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+分城市×产品类型的周销售额预测
+特点：所有细分市场的周销售额排成一个矩阵（周×细分），线性趋势+季节项用一次最小二乘同时拟合全部列，
+Holt指数平滑按时间递推、每一步对全部细分做向量运算；
+需要逐细分搜索参数的较重模型在细分数较多时分块交给进程池
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# 细分维度
+SEGMENT_DIMS = ("城市", "产品类型")
+# 季节周期（周，约一个月）
+SEASON_WEEKS = 4
+# 95%预测区间的z值
+Z_95 = 1.96
+# Holt参数搜索网格
+ALPHA_GRID = np.linspace(0.1, 0.9, 9)
+BETA_GRID = np.array([0.01, 0.05, 0.1, 0.2, 0.3, 0.5])
+# 细分数达到该值时，参数搜索交给进程池
+POOL_MIN_SEGMENTS = 200
+
+
+def weekly_matrix(trend):
+    """
+    每日趋势 -> 周销售额矩阵
+    返回 (各周起始日期, 细分取值表, Y[周, 细分])，只保留完整的周（末尾不足7天的丢弃）
+    """
+    segments, daily = trend.segment_daily(SEGMENT_DIMS)
+    n_weeks = len(trend.days) // 7
+    weekly = daily[:n_weeks * 7].reshape(n_weeks, 7, -1).sum(axis=1)
+    return trend.days[:n_weeks * 7:7], segments, weekly
+
+
+def _design(t, season):
+    """线性趋势（+季节）设计矩阵：截距、时间、一对正余弦季节项"""
+    columns = [np.ones_like(t, dtype=float), t.astype(float)]
+    if season:
+        angle = 2 * np.pi * t / SEASON_WEEKS
+        columns += [np.sin(angle), np.cos(angle)]
+    return np.column_stack(columns)
+
+
+def fit_seasonal_trend(weekly, horizon):
+    """线性趋势+季节项：全部细分共用设计矩阵，一次最小二乘求出所有列的系数"""
+    n_weeks = len(weekly)
+    season = n_weeks >= 2 * SEASON_WEEKS
+    design = _design(np.arange(n_weeks), season)
+    coef, *_ = np.linalg.lstsq(design, weekly, rcond=None)
+    residual = weekly - design @ coef
+    dof = max(n_weeks - design.shape[1], 1)
+    sigma = np.sqrt((residual ** 2).sum(axis=0) / dof)
+    forecast = _design(np.arange(n_weeks, n_weeks + horizon), season) @ coef
+    return forecast, np.broadcast_to(Z_95 * sigma, forecast.shape)
+
+
+def _holt(weekly, alpha, beta):
+    """Holt线性指数平滑（alpha/beta可为标量或与细分数等长的数组），返回 (水平, 趋势, 一步预测误差平方和)"""
+    level = weekly[0]
+    slope = weekly[1] - weekly[0] if len(weekly) > 1 else np.zeros_like(level)
+    sse = np.zeros_like(level)
+    for value in weekly[1:]:
+        error = value - (level + slope)
+        sse = sse + error ** 2
+        new_level = alpha * value + (1 - alpha) * (level + slope)
+        slope = beta * (new_level - level) + (1 - beta) * slope
+        level = new_level
+    return level, slope, sse
+
+
+def _holt_forecast(weekly, horizon, level, slope, sse):
+    """由平滑结果外推，预测区间随预测步数按 √h 放宽（近似）"""
+    steps = np.arange(1, horizon + 1)[:, None]
+    forecast = level + steps * slope
+    sigma = np.sqrt(sse / max(len(weekly) - 2, 1))
+    return forecast, Z_95 * sigma * np.sqrt(steps)
+
+
+def fit_holt(weekly, horizon, alpha=0.5, beta=0.1):
+    """Holt指数平滑（固定参数），每个时间步对全部细分做向量运算"""
+    level, slope, sse = _holt(weekly, alpha, beta)
+    return _holt_forecast(weekly, horizon, level, slope, sse)
+
+
+def _holt_grid(weekly):
+    """对一组细分搜索Holt参数：每组参数仍对全部细分向量化，返回各细分的 (水平, 趋势, 误差平方和)"""
+    best = None
+    for alpha in ALPHA_GRID:
+        for beta in BETA_GRID:
+            level, slope, sse = _holt(weekly, alpha, beta)
+            if best is None:
+                best = [level, slope, sse]
+                continue
+            better = sse < best[2]
+            for i, values in enumerate((level, slope, sse)):
+                best[i] = np.where(better, values, best[i])
+    return best
+
+
+def fit_holt_tuned(weekly, horizon, max_workers=None):
+    """Holt指数平滑（逐细分搜索参数）：细分数较多时按列分块交给进程池"""
+    n_segments = weekly.shape[1]
+    if n_segments < POOL_MIN_SEGMENTS:
+        level, slope, sse = _holt_grid(weekly)
+    else:
+        max_workers = max_workers or os.cpu_count() or 1
+        chunks = np.array_split(weekly, max_workers, axis=1)
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            parts = list(pool.map(_holt_grid, chunks))
+        level, slope, sse = (np.concatenate([part[i] for part in parts]) for i in range(3))
+    return _holt_forecast(weekly, horizon, level, slope, sse)
+
+
+# 可选预测模型
+MODELS = {
+    "线性趋势+季节": fit_seasonal_trend,
+    "Holt指数平滑": fit_holt,
+    "Holt指数平滑（参数搜索）": fit_holt_tuned,
+}
+
+
+def forecast_segments(trend, model="线性趋势+季节", horizon=8):
+    """
+    预测每个 城市×产品类型 未来horizon周的销售额
+    返回长表 DataFrame：城市, 产品类型, 周, 类型(历史/预测), 销售额, 下限, 上限
+    """
+    weeks, segments, weekly = weekly_matrix(trend)
+    if len(weekly) < 3:
+        raise ValueError("完整的周数据不足3周，无法预测")
+    forecast, margin = MODELS[model](weekly, horizon)
+    forecast = np.clip(forecast, 0, None)  # 销售额不会为负
+    future_weeks = weeks[-1] + 7 * np.arange(1, horizon + 1)
+
+    frames = []
+    for kind, week_starts, values, low, high in (
+        ("历史", weeks, weekly, weekly, weekly),
+        ("预测", future_weeks, forecast, forecast - margin, forecast + margin),
+    ):
+        n_weeks, n_segments = values.shape
+        frame = segments.iloc[np.tile(np.arange(n_segments), n_weeks)].reset_index(drop=True)
+        frame["周"] = np.repeat(week_starts.astype("datetime64[ns]"), n_segments)
+        frame["类型"] = kind
+        frame["销售额"] = values.ravel()
+        frame["下限"] = np.clip(low, 0, None).ravel()
+        frame["上限"] = np.asarray(high).ravel()
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
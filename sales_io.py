@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+销售Excel流式读取
+特点：openpyxl只读流式模式只打开一次工作簿，自动选择工作表、定位表头行，
+只取需要的列并按列类型直接转成数组，不把所有单元格都读成DataFrame
+"""
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+# 销售数据需要的列及类型
+SALES_COLUMNS = {
+    "订单号": object,
+    "城市": "category",
+    "顾客类型": "category",
+    "性别": "category",
+    "产品类型": "category",
+    "总价": float,
+    "评分": float,
+    "时间": object,
+    "日期": "datetime64[ns]",
+}
+# 表头行只在前几行里找（第一行通常是标题，如"2022年前3个月销售数据"）
+HEADER_SEARCH_ROWS = 10
+
+
+def _pick_sheet(workbook, sheet_name):
+    """优先使用指定名称的工作表，不存在时使用第一个工作表"""
+    if sheet_name in workbook.sheetnames:
+        return workbook[sheet_name]
+    return workbook.worksheets[0]
+
+
+def _find_header(rows, columns, optional=()):
+    """
+    在前几行中找到包含全部所需列名的表头行，返回 (表头行号, {列名: 列位置})
+    optional中的列可以没有（不出现在返回的列位置中）
+    """
+    required = [col for col in columns if col not in optional]
+    best_missing = required
+    for row_no, row in enumerate(rows, start=1):
+        names = [str(v).strip() if v is not None else None for v in row]
+        positions = {col: names.index(col) for col in columns if col in names}
+        missing = [col for col in required if col not in positions]
+        if not missing:
+            return row_no, positions
+        if len(missing) < len(best_missing):
+            best_missing = missing
+        if row_no >= HEADER_SEARCH_ROWS:
+            break
+    raise ValueError(f"Excel缺少关键列：{best_missing}")
+
+
+def _to_frame(buffers, columns):
+    """按列类型把缓冲的单元格值转成DataFrame"""
+    data = {}
+    for col, dtype in columns.items():
+        if dtype is float:
+            data[col] = np.array(buffers[col], dtype=float)  # None 转为 NaN
+        elif dtype == "datetime64[ns]":
+            data[col] = pd.to_datetime(pd.Series(buffers[col], dtype=object), errors="coerce")
+        else:
+            data[col] = pd.Series(buffers[col], dtype=dtype)
+    return pd.DataFrame(data)
+
+
+def iter_workbook_chunks(path, columns=SALES_COLUMNS, sheet_name="销售数据", chunk_size=100_000, optional=()):
+    """
+    流式读取工作簿，每次产出至多chunk_size行的DataFrame（只含columns中的列）
+    optional：可选列，工作表中没有时结果中也没有该列
+    """
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = _pick_sheet(workbook, sheet_name)
+        header_row, positions = _find_header(sheet.iter_rows(max_row=HEADER_SEARCH_ROWS, values_only=True),
+                                             columns, optional)
+        columns = {col: dtype for col, dtype in columns.items() if col in positions}
+        buffers = {col: [] for col in columns}
+        n_buffered = 0
+        for row in sheet.iter_rows(min_row=header_row + 1, values_only=True):
+            if all(v is None for v in row):
+                continue  # 跳过空行
+            for col, pos in positions.items():
+                buffers[col].append(row[pos] if pos < len(row) else None)
+            n_buffered += 1
+            if chunk_size and n_buffered >= chunk_size:
+                yield _to_frame(buffers, columns)
+                buffers = {col: [] for col in columns}
+                n_buffered = 0
+        if n_buffered or not chunk_size:
+            yield _to_frame(buffers, columns)
+    finally:
+        workbook.close()
+
+
+def derive_hour(times):
+    """从时间列提取交易小时数（适配 时:分:秒 和 时:分 两种格式）"""
+    hours = pd.to_datetime(times, format="%H:%M:%S", errors="coerce").dt.hour
+    if hours.isnull().all():
+        hours = pd.to_datetime(times, format="%H:%M", errors="coerce").dt.hour
+    return hours
+
+
+def read_workbook(path, columns=SALES_COLUMNS, sheet_name="销售数据", optional=()):
+    """一次性读取工作簿中所需的列（optional中的列可以没有），返回DataFrame"""
+    return next(iter_workbook_chunks(path, columns, sheet_name, chunk_size=None, optional=optional))
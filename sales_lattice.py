@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+透视分析用的聚合格（cuboid lattice）
+特点：加载时从立方体物化若干维度组合的聚合结果（每个都是一个更小的立方体），
+任意透视只需找到覆盖所需维度且单元格最少的聚合结果再向上汇总，不回到明细行；
+物化的组合受单元格总数上限约束，经常被查询的组合会在使用中补充物化；
+聚合格挂在各会话共用的数据集上：计数和补充物化在锁内进行，物化结果整体换成新字典，读取方遍历的是某一版字典，不会遇到遍历中被修改
+"""
+
+import threading
+from collections import Counter
+from itertools import combinations
+
+import numpy as np
+
+from sales_cube import SalesCube
+
+# 透视可选的指标
+PIVOT_MEASURES = ("总销售额", "订单数", "平均评分", "每单平均销售额")
+# 加载时物化的组合最多包含的维度数
+DEFAULT_MAX_DIMS = 2
+# 全部物化结果的单元格总数上限（内存约束）
+MAX_LATTICE_CELLS = 2_000_000
+# 某个组合被查询多少次后补充物化
+MATERIALIZE_AFTER_HITS = 3
+
+
+class CuboidLattice:
+    """cuboids：{维度集合: 按这些维度聚合的立方体}，最细的一层就是原立方体本身"""
+
+    def __init__(self, cube, combos=None, max_dims=DEFAULT_MAX_DIMS, max_cells=MAX_LATTICE_CELLS):
+        self.dims = list(cube.dims)
+        self.max_cells = max_cells
+        self.cuboids = {frozenset(self.dims): cube}
+        self.hits = Counter()
+        self._lock = threading.Lock()
+        if combos is None:
+            combos = [combo for size in range(1, max_dims + 1) for combo in combinations(self.dims, size)]
+        # 先物化维度多的组合，维度少的组合再从它们汇总（父结果更小，汇总更快）
+        for combo in sorted(combos, key=len, reverse=True):
+            if self.n_cells >= self.max_cells:
+                break
+            self.materialize(combo)
+
+    @property
+    def n_cells(self):
+        return sum(len(cuboid) for cuboid in self.cuboids.values())
+
+    def covering(self, dims):
+        """覆盖所需维度、单元格最少的物化结果"""
+        needed = frozenset(dims)
+        candidates = [cuboid for key, cuboid in self.cuboids.items() if needed <= key]
+        return min(candidates, key=len)
+
+    def materialize(self, dims):
+        """从最小的覆盖结果汇总出某个维度组合，并加入物化结果（复制出新字典后一次替换）"""
+        key = frozenset(dims)
+        with self._lock:
+            cuboid = self.cuboids.get(key)
+            if cuboid is None:
+                ordered = [dim for dim in self.dims if dim in key]
+                cuboid = SalesCube(self.covering(key).to_cells(), dims=ordered, cells=True)
+                self.cuboids = {**self.cuboids, key: cuboid}
+            return cuboid
+
+    def rollup(self, dims):
+        """按dims汇总：已物化时直接返回，否则从最小的覆盖结果临时汇总（常用组合补充物化）"""
+        key = frozenset(dims)
+        cuboid = self.cuboids.get(key)
+        with self._lock:
+            self.hits[key] += 1
+            hits = self.hits[key]
+        if cuboid is not None:
+            return cuboid
+        if hits >= MATERIALIZE_AFTER_HITS and self.n_cells < self.max_cells:
+            return self.materialize(dims)
+        ordered = [dim for dim in self.dims if dim in key]
+        return SalesCube(self.covering(key).to_cells(), dims=ordered, cells=True)
+
+    def pivot(self, rows, columns, measure="总销售额"):
+        """透视表：行维度 × 列维度，单元格为指定指标（没有订单的组合为空）"""
+        rows, columns = list(rows), [dim for dim in columns if dim not in rows]
+        cells = self.rollup(rows + columns).to_cells()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            values = {
+                "总销售额": cells["总价"],
+                "订单数": cells["订单数"],
+                "平均评分": cells["评分合计"] / cells["订单数"],
+                "每单平均销售额": cells["总价"] / cells["订单数"],
+            }[measure]
+        table = cells[rows + columns].assign(**{measure: values}).set_index(rows + columns)[measure].sort_index()
+        if columns:
+            table = table.unstack(columns)
+        return table.to_frame() if table.ndim == 1 else table
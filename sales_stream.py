@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+多年销售历史的分块流式聚合
+特点：按块读取历史数据（Excel流式读取 / CSV分块读取），每块只算出
+(小时数, 产品类型, 城市, 顾客类型, 性别) 的部分合计后立即丢弃明细，再合并各部分结果；
+内存只与单元格数量有关，与加载的月份数无关；各文件/数据块在进程池中并行处理
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from sales_cube import DEFAULT_DIMS, SalesCube, merge_cubes
+from sales_io import SALES_COLUMNS, derive_hour, iter_workbook_chunks
+
+# 流式聚合需要的原始列
+STREAM_COLUMNS = ["城市", "顾客类型", "性别", "产品类型", "总价", "评分", "时间"]
+# 支持的历史文件类型
+HISTORY_SUFFIXES = (".xlsx", ".csv")
+
+
+def list_history_files(history_dir):
+    """列出历史数据目录下的全部销售文件（按文件名排序）"""
+    names = sorted(name for name in os.listdir(history_dir) if name.lower().endswith(HISTORY_SUFFIXES))
+    return [os.path.join(history_dir, name) for name in names]
+
+
+def chunk_cube(chunk):
+    """一块明细 -> 部分聚合结果（立方体）"""
+    chunk = chunk.assign(小时数=derive_hour(chunk["时间"]))
+    chunk = chunk.dropna(subset=["总价", "评分", "小时数"])
+    return SalesCube(chunk, dims=DEFAULT_DIMS)
+
+
+def iter_file_chunks(path, chunk_size):
+    """按块读取单个历史文件，只读取聚合所需的列"""
+    if path.lower().endswith(".csv"):
+        yield from pd.read_csv(path, usecols=STREAM_COLUMNS, chunksize=chunk_size)
+    else:
+        columns = {col: SALES_COLUMNS[col] for col in STREAM_COLUMNS}
+        yield from iter_workbook_chunks(path, columns, chunk_size=chunk_size)
+
+
+def aggregate_file(path, chunk_size=100_000):
+    """聚合单个文件：逐块聚合并立即合并，任何时刻只保留一块明细；文件没有数据行时返回None"""
+    result = None
+    for chunk in iter_file_chunks(path, chunk_size):
+        if chunk.empty:
+            continue  # 只有表头的文件（如空的月度导出）
+        partial = chunk_cube(chunk)
+        result = partial if result is None else merge_cubes([result, partial])
+    return result
+
+
+def aggregate_history(paths, chunk_size=100_000, max_workers=None):
+    """
+    聚合多个历史文件，返回合并后的立方体
+    - 多个文件：每个文件一个任务，在进程池中并行流式聚合
+    - 单个文件：主进程按块读取，数据块分发到进程池聚合（同时在途的块数有上限，内存有界）
+    全部文件都没有可聚合的数据时抛出ValueError
+    """
+    paths = list(paths)
+    if not paths:
+        raise ValueError("没有可聚合的历史销售文件")
+    max_workers = max_workers or os.cpu_count() or 1
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        if len(paths) > 1:
+            partials = [p for p in pool.map(aggregate_file, paths, [chunk_size] * len(paths)) if p is not None]
+            result = merge_cubes(partials)
+        else:
+            result, pending = None, []
+            for chunk in iter_file_chunks(paths[0], chunk_size):
+                if chunk.empty:
+                    continue
+                pending.append(pool.submit(chunk_cube, chunk))
+                if len(pending) >= 2 * max_workers:
+                    partials = [f.result() for f in pending] + ([result] if result is not None else [])
+                    result, pending = merge_cubes(partials), []
+            partials = [f.result() for f in pending] + ([result] if result is not None else [])
+            result = merge_cubes(partials)
+    if not result.count.sum():
+        raise ValueError("历史销售文件中没有可聚合的订单")
+    return result
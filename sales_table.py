@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+明细数据分页表格（服务端搜索/排序/分页）
+特点：搜索和排序都在服务端按行号完成，排序直接复用数据集预先排好的全表顺序（不必每次重新排序），
+浏览器每次只收到当前一页的数据，翻页时才取下一页；
+Top-N / Bottom-N 用 argpartition 部分选择，只对选出的N个排序
+"""
+
+import hashlib
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from ui_widgets import PAGE_SIZES, pager
+
+# 关键字搜索的列
+SEARCH_COLUMNS = ("订单号", "城市", "顾客类型", "性别", "产品类型")
+
+
+def search_rows(df, rows, text, columns=SEARCH_COLUMNS):
+    """在给定行号中按关键字搜索（分类列只比较类别取值，不逐行比较字符串）"""
+    if not text:
+        return rows
+    hit = np.zeros(len(rows), dtype=bool)
+    for col in columns:
+        if col not in df.columns:
+            continue
+        series = df[col]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            matched = np.flatnonzero(series.cat.categories.astype(str).str.contains(text, regex=False))
+            if len(matched):
+                hit |= np.isin(series.cat.codes.to_numpy()[rows], matched)
+        else:
+            hit |= series.iloc[rows].astype(str).str.contains(text, regex=False).to_numpy()
+    return rows[hit]
+
+
+def top_n(values, n, largest=True):
+    """前N个（largest=False时为后N个）的位置，按取值排好序；argpartition选出后只排这N个，O(n + N·logN)"""
+    n = min(n, len(values))
+    if n <= 0:
+        return np.zeros(0, dtype=np.int64)
+    key = -values if largest else values
+    picked = np.argpartition(key, n - 1)[:n]
+    return picked[np.argsort(key[picked], kind="stable")]
+
+
+def top_n_with_rest(labels, values, n, largest=True, label_col="名称", value_col="总价"):
+    """Top-N表 + "其他"汇总行（其他 = 总和 - 前N个之和，不再对剩余部分排序）"""
+    picked = top_n(values, n, largest)
+    table = pd.DataFrame({label_col: np.asarray(labels)[picked], value_col: values[picked]})
+    n_rest = len(values) - len(picked)
+    if n_rest > 0:
+        rest = pd.DataFrame({label_col: [f"其他（{n_rest:,} 项）"], value_col: [values.sum() - values[picked].sum()]})
+        table = pd.concat([table, rest], ignore_index=True)
+    return table
+
+
+def sort_rows(order, rows, n_rows, descending=False):
+    """按全表排序顺序order给行号排序：标记选中行后按顺序过滤一遍，O(n)且无需比较排序"""
+    member = np.zeros(n_rows, dtype=bool)
+    member[rows] = True
+    result = order[member[order]]
+    return result[::-1] if descending else result
+
+
+def paged_table(dataset, rows, key="raw_table"):
+    """
+    分页展示明细：rows为筛选后的行号（位图索引结果）
+    查询结果（搜索+排序后的行号）按条件缓存在会话中，翻页时不重新计算
+    """
+    df = dataset.df
+    col1, col2, col3, col4 = st.columns([3, 2, 1, 1])
+    with col1:
+        text = st.text_input("搜索（订单号/城市/顾客类型/性别/产品类型）", key=f"{key}_search").strip()
+    with col2:
+        sort_col = st.selectbox("排序列", ["默认顺序"] + list(df.columns), key=f"{key}_sort")
+    with col3:
+        descending = st.toggle("降序", key=f"{key}_desc")
+    with col4:
+        page_size = st.selectbox("每页行数", PAGE_SIZES, key=f"{key}_page_size")
+
+    # 查询条件没变时直接复用上次结果
+    query = (dataset.version, hashlib.sha1(rows).hexdigest(), text, sort_col, descending)
+    cached = st.session_state.get(f"{key}_result")
+    if cached is not None and cached[0] == query:
+        result = cached[1]
+    else:
+        result = search_rows(df, rows, text)
+        if sort_col != "默认顺序":
+            result = sort_rows(dataset.sort_order(sort_col), result, len(df), descending)
+        elif descending:
+            result = result[::-1]
+        st.session_state[f"{key}_result"] = (query, result)
+
+    # 只把当前页发送到浏览器
+    start, stop = pager(len(result), page_size, key)
+    st.dataframe(df.iloc[result[start:stop]], use_container_width=True)
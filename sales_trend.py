@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+每日销售趋势（日销售额 + 7日/30日滑动平均）
+特点：加载时从立方体得到 日期×(城市,顾客类型,性别,产品类型) 的日销售额矩阵并求一次累计和，
+任意筛选/拆分只需把选中分组的累计和相加，滑动平均由累计和相减得到，不再对全历史调用 rolling()；
+数据更新时只为新增（或变化）的日期续算累计和，之前的日期直接复用
+"""
+
+import numpy as np
+import pandas as pd
+
+# 趋势的分组维度（筛选和拆分都在这些维度上进行）
+TREND_DIMS = ("城市", "顾客类型", "性别", "产品类型")
+# 滑动窗口（天）
+WINDOWS = (7, 30)
+
+
+def first_changed_row(old, new):
+    """两版按日期排列的矩阵中，第一个不同的行号（前面的行都相同，之前的计算结果可以复用）"""
+    n_common = min(len(old), len(new))
+    same = np.isclose(old[:n_common], new[:n_common]).reshape(n_common, -1).all(axis=1)
+    return n_common if same.all() else int(np.argmin(same))
+
+
+class DailyTrend:
+    """
+    日销售额矩阵：days为连续的自然日（无订单的日期记为0），groups为各分组的维度取值，
+    daily[日, 分组] 为日销售额，cumsum 为按日期的累计和
+    """
+
+    def __init__(self, cube, previous=None):
+        cells = cube.to_cells()
+        days = cells["日期"].to_numpy(dtype="datetime64[D]")
+        valid = ~np.isnat(days)
+        cells, days = cells[valid], days[valid]
+        grouped = cells.groupby(list(TREND_DIMS), observed=True, sort=True)
+        group_ids = grouped.ngroup().to_numpy()
+        self.groups = grouped.size().index.to_frame(index=False)
+        self.start = days.min() if len(days) else np.datetime64("NaT", "D")
+        n_days = int((days.max() - self.start).astype(int)) + 1 if len(days) else 0
+        self.days = self.start + np.arange(n_days)
+
+        n_groups = len(self.groups)
+        day_idx = (days - self.start).astype(np.int64)
+        self.daily = np.bincount(day_idx * n_groups + group_ids, weights=cells["总价"].to_numpy(dtype=float),
+                                 minlength=n_days * n_groups).reshape(n_days, n_groups)
+        self.reused_days = 0
+        self.cumsum = self._cumsum(previous)
+
+    def _cumsum(self, previous):
+        """累计和：与上一版本相同的日期直接复用，从第一个不同的日期开始续算"""
+        keep = 0
+        if (previous is not None and previous.start == self.start
+                and previous.groups.equals(self.groups)):
+            keep = first_changed_row(previous.daily, self.daily)
+        cumsum = np.empty_like(self.daily)
+        if keep:
+            cumsum[:keep] = previous.cumsum[:keep]
+        base = cumsum[keep - 1] if keep else 0.0
+        cumsum[keep:] = base + np.cumsum(self.daily[keep:], axis=0)
+        self.reused_days = keep
+        return cumsum
+
+    def segment_daily(self, dims):
+        """按dims合并分组 -> (细分取值表, 日销售额矩阵[日, 细分])"""
+        grouped = self.groups.groupby(list(dims), observed=True, sort=True)
+        codes = grouped.ngroup().to_numpy()
+        segments = grouped.size().index.to_frame(index=False)
+        combine = np.zeros((len(self.groups), len(segments)))
+        combine[np.arange(len(codes)), codes] = 1.0
+        return segments, self.daily @ combine
+
+    def series(self, selection=None, split="城市"):
+        """
+        筛选条件 + 拆分维度 -> 长表 DataFrame（日期, 拆分维度, 日销售额, 7日均值, 30日均值）
+        所有分组一次矩阵乘法合并到拆分维度的各取值上，滑动平均用累计和相减
+        """
+        mask = np.ones(len(self.groups), dtype=bool)
+        for dim, chosen in (selection or {}).items():
+            if dim in TREND_DIMS:
+                mask &= self.groups[dim].isin(list(chosen)).to_numpy()
+        split_codes, split_values = pd.factorize(self.groups[split], sort=True)
+        # 分组 -> 拆分取值 的0/1矩阵（未选中的分组整行为0）
+        combine = np.zeros((len(self.groups), len(split_values)))
+        combine[np.flatnonzero(mask), split_codes[mask]] = 1.0
+        present = combine.any(axis=0)
+        combine, split_values = combine[:, present], np.asarray(split_values)[present]
+        daily = self.daily @ combine
+        cumsum = self.cumsum @ combine
+
+        result = {"日销售额": daily}
+        padded = np.vstack([np.zeros((1, cumsum.shape[1])), cumsum])
+        t = np.arange(len(self.days))
+        for window in WINDOWS:
+            lagged = padded[np.maximum(t + 1 - window, 0)]
+            # 开头不足一个窗口时按已有天数平均
+            result[f"{window}日均值"] = (cumsum - lagged) / np.minimum(window, t + 1)[:, None]
+
+        n_days, n_split = daily.shape
+        frame = pd.DataFrame({
+            "日期": np.repeat(self.days.astype("datetime64[ns]"), n_split),
+            split: np.tile(split_values, n_days),
+        })
+        for name, values in result.items():
+            frame[name] = values.ravel()
+        return frame
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+全体学生批量成绩预测 + 预警名单（lll.py / mys.py 共用）
+特点：全体学生（或上传的CSV）一次向量化 predict，结果按 (模型版本, 数据版本) 缓存；
+名单按预测成绩从低到高排好，翻页时只取当前一页发送到浏览器
+"""
+
+import hashlib
+import io
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from student_stats import NUMERIC_COLS
+from ui_widgets import PAGE_SIZES, pager
+
+# 预警分数线（预测成绩低于该值列入预警名单）
+AT_RISK_SCORE = 60
+# 预测成绩列名
+PRED_COL = "预测期末成绩"
+
+
+def read_student_csv(content):
+    """读取上传的学生CSV（字节内容），数值列统一转为数值"""
+    df = pd.read_csv(io.BytesIO(content), encoding="utf-8-sig")
+    numeric_cols = [col for col in NUMERIC_COLS if col in df.columns]
+    df[numeric_cols] = df[numeric_cols].apply(pd.to_numeric, errors="coerce")
+    return df
+
+
+def rank_students(df, pred):
+    """附上预测成绩，按预测成绩从低到高排序（风险最高的在前）"""
+    order = np.argsort(pred, kind="stable")
+    ranked = df.iloc[order].reset_index(drop=True)
+    ranked.insert(0, "风险排名", np.arange(1, len(ranked) + 1))
+    ranked[PRED_COL] = np.round(pred[order], 2)
+    return ranked
+
+
+@st.cache_data(max_entries=8, show_spinner="正在批量预测...")
+def score_students(model_version, data_version, _df, _predict, features):
+    """
+    批量预测：特征完整的学生一次 predict，返回 (按风险排序的名单, 跳过的行数)
+    缓存键只有 模型版本 + 数据版本 + 特征（数据和模型本身不参与哈希）
+    """
+    complete = _df[features].notna().all(axis=1).to_numpy()
+    students = _df[complete]
+    return rank_students(students, np.asarray(_predict(students), dtype=float)), int((~complete).sum())
+
+
+@st.cache_data(max_entries=4)
+def _load_upload(data_version, _content):
+    return read_student_csv(_content)
+
+
+def batch_prediction_panel(df, data_version, features, predict, model_version, key="batch"):
+    """
+    批量预测页面：全体学生或上传CSV -> 一次预测 -> 预警统计 + 分页名单 + 预警名单下载
+    predict(DataFrame) -> 预测成绩数组；features：predict需要的列
+    """
+    source = st.radio("预测对象", ["全体学生", "上传CSV"], horizontal=True, key=f"{key}_source")
+    if source == "上传CSV":
+        uploaded = st.file_uploader(f"上传学生CSV（需包含列：{'、'.join(features)}）", type="csv", key=f"{key}_upload")
+        if uploaded is None:
+            return
+        content = uploaded.getvalue()
+        data_version = hashlib.sha256(content).hexdigest()
+        try:
+            df = _load_upload(data_version, content)
+        except (ValueError, UnicodeDecodeError) as e:
+            st.error(f"❌ CSV读取失败：{e}")
+            return
+        missing = [col for col in features if col not in df.columns]
+        if missing:
+            st.error(f"❌ CSV缺少列：{'、'.join(missing)}")
+            return
+
+    ranked, n_skipped = score_students(model_version, data_version, df, predict, list(features))
+    if n_skipped:
+        st.warning(f"⚠️ {n_skipped:,} 名学生的特征数据不完整，未参与预测")
+    if ranked.empty:
+        st.info("没有可预测的学生")
+        return
+
+    # 预警统计（名单已按预测成绩升序，预警学生就是开头的一段）
+    n_at_risk = int(np.searchsorted(ranked[PRED_COL].to_numpy(), AT_RISK_SCORE))
+    col1, col2, col3 = st.columns(3)
+    col1.metric("预测人数", f"{len(ranked):,}")
+    col2.metric("预测平均分", f"{ranked[PRED_COL].mean():.2f}")
+    col3.metric(f"预警人数（<{AT_RISK_SCORE}分）", f"{n_at_risk:,}", f"{n_at_risk / len(ranked):.1%}", delta_color="off")
+
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        at_risk_only = st.toggle(f"只看预警名单（预测成绩 < {AT_RISK_SCORE} 分）", value=True, key=f"{key}_at_risk")
+    with col2:
+        page_size = st.selectbox("每页行数", PAGE_SIZES, key=f"{key}_page_size")
+    n_rows = n_at_risk if at_risk_only else len(ranked)
+
+    # 只把当前页发送到浏览器
+    start, stop = pager(n_rows, page_size, key, caption="共 {n_rows:,} 名学生，第 {page} / {n_pages} 页（按预测成绩从低到高）")
+    st.dataframe(ranked.iloc[start:stop], hide_index=True, use_container_width=True)
+
+    # 点击下载时才生成CSV
+    st.download_button(f"⬇️ 下载预警名单（{n_at_risk:,} 人）",
+                       data=lambda: ranked.iloc[:n_at_risk].to_csv(index=False).encode("utf-8-sig"),
+                       file_name="预警名单.csv", mime="text/csv", on_click="ignore", key=f"{key}_download")
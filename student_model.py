@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+学生期末成绩预测模型（lll.py 使用）
+特点：训练时记录特征列表和专业编码映射，预测时按制品里保存的映射编码，不依赖当前数据的专业取值；
+随机森林分批增加树（warm_start）以便报告训练进度，训练指标用袋外（OOB）预测计算，不需要另外划分验证集再训练一遍；
+森林训练完成前用线性回归（闭式解，毫秒级）作为备用模型
+"""
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.metrics import mean_absolute_error, r2_score
+from sklearn.model_selection import train_test_split
+
+from model_registry import ModelRegistry, ModelStore
+
+# 特征列（顺序即模型输入顺序）和预测目标
+FEATURES = ["性别", "专业", "每周学习时长（小时）", "上课出勤率", "期中考试分数", "作业完成率"]
+TARGET = "期末考试分数"
+# 性别编码
+GENDER_CODES = {"男": 1, "女": 0}
+# 训练配置（变化后对应新制品）
+FOREST_SPEC = {
+    "model": "RandomForestRegressor",
+    "params": {"n_estimators": 100, "random_state": 42},
+    "features": FEATURES,
+    "target": TARGET,
+}
+# 备用模型：与 mys.py 相同的线性回归（4个数值特征）
+LINEAR_SPEC = {
+    "model": "LinearRegression",
+    "features": ["每周学习时长（小时）", "上课出勤率", "期中考试分数", "作业完成率"],
+    "target": TARGET,
+}
+# 模型类型 -> 显示名称
+MODEL_LABELS = {"RandomForestRegressor": "随机森林", "LinearRegression": "线性回归"}
+# 随机森林每批增加的树数（每批报告一次进度）
+TREES_PER_STEP = 10
+
+
+def encode_students(df, artifact):
+    """学生数据 -> 模型输入（按制品里保存的编码映射；训练时没见过的专业编码为-1）"""
+    X = df[artifact["features"]].copy()
+    if "性别" in X:
+        X["性别"] = X["性别"].map(artifact["gender_codes"])
+    if "专业" in X:
+        X["专业"] = pd.Index(artifact["major_mapping"]).get_indexer(X["专业"])
+    return X
+
+
+def _encodings(df, spec):
+    """制品的特征和编码映射部分"""
+    return {
+        "model_label": MODEL_LABELS[spec["model"]],
+        "features": list(spec["features"]),
+        "gender_codes": dict(GENDER_CODES),
+        "major_mapping": pd.factorize(df["专业"], sort=True)[1].tolist(),
+    }
+
+
+def train_forest(df, spec, progress=None):
+    """
+    训练随机森林，返回制品内容（模型 + 特征 + 编码映射 + 指标）
+    每批增加 TREES_PER_STEP 棵树并调用 progress(已完成棵数, 总棵数)；结果与一次训练全部树相同
+    """
+    artifact = _encodings(df, spec)
+    X = encode_students(df, artifact)
+    y = df[spec["target"]].to_numpy()
+    n_trees = spec["params"]["n_estimators"]
+    model = RandomForestRegressor(**dict(spec["params"], n_estimators=0), warm_start=True)
+    for done in range(min(TREES_PER_STEP, n_trees), n_trees + TREES_PER_STEP, TREES_PER_STEP):
+        done = min(done, n_trees)
+        # 袋外预测只在最后一批计算（需要全部树）
+        model.set_params(n_estimators=done, oob_score=done == n_trees)
+        model.fit(X, y)
+        if progress is not None:
+            progress(done, n_trees)
+    oob = model.oob_prediction_
+    artifact["model"] = model
+    artifact["metrics"] = {
+        "n_train": int(len(y)),
+        "validation": "袋外",
+        "r2": float(model.oob_score_),
+        "mae": float(mean_absolute_error(y[~np.isnan(oob)], oob[~np.isnan(oob)])),
+    }
+    return artifact
+
+
+def train_linear(df, spec, progress=None):
+    """训练线性回归备用模型（留出20%计算指标，做法与 mys.py 相同）"""
+    artifact = _encodings(df, spec)
+    X = encode_students(df, artifact)
+    y = df[spec["target"]]
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    model = LinearRegression()
+    model.fit(X_train, y_train)
+    pred = model.predict(X_test)
+    artifact["model"] = model
+    artifact["metrics"] = {
+        "n_train": int(len(y_train)),
+        "validation": "留出集",
+        "r2": float(r2_score(y_test, pred)),
+        "mae": float(mean_absolute_error(y_test, pred)),
+    }
+    return artifact
+
+
+def student_model_store(name="lll_forest"):
+    """lll.py 的模型仓库（随机森林，训练完成前用线性回归备用）"""
+    return ModelStore(ModelRegistry(name), FOREST_SPEC, train_forest,
+                      fallback_spec=LINEAR_SPEC, fallback_trainer=train_linear)
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+学生数据 - 各专业统计表（lll.py / mys.py 共用）
+特点：数值列均值用一次分组聚合，性别人数用交叉表，全部向量化；
+由应用已加载的明细统计，结果存放在该明细的快照旁边，学生数据表.xlsx 内容和读取方式不变时直接读取，不再重新统计
+"""
+
+import pandas as pd
+
+from data_cache import load_table
+
+# 学生数据文件
+STUDENT_FILE = "学生数据表.xlsx"
+# 数值列（读取时统一转为数值）
+NUMERIC_COLS = ["每周学习时长（小时）", "上课出勤率", "期中考试分数", "作业完成率", "期末考试分数"]
+# 性别取值（交叉表固定列顺序，某专业没有该性别时人数为0）
+GENDERS = ["男", "女"]
+# 解析/统计逻辑版本号：read_student_excel、compute_major_stats 改动后递增，旧快照随之失效
+READER_VERSION = 1
+STATS_VERSION = 1
+
+
+def read_student_excel(file_path):
+    """读取Excel并确保数值字段格式正确"""
+    df = pd.read_excel(file_path)
+    df[NUMERIC_COLS] = df[NUMERIC_COLS].apply(pd.to_numeric, errors="coerce")
+    return df
+
+
+def compute_major_stats(df):
+    """
+    各专业统计：数值列均值 + 男/女生人数 + 总人数（按专业排序）
+    列：专业, 每周学习时长（小时）, 上课出勤率, 期中考试分数, 作业完成率, 期末考试分数, 男生人数, 女生人数, 人数
+    """
+    means = df.groupby("专业", sort=True)[NUMERIC_COLS].mean()
+    genders = pd.crosstab(df["专业"], df["性别"]).reindex(columns=GENDERS, fill_value=0)
+    genders.columns = [f"{gender}生人数" for gender in GENDERS]
+    stats = means.join(genders, how="left").fillna({col: 0 for col in genders.columns})
+    stats["人数"] = df["专业"].value_counts().reindex(stats.index).to_numpy()
+    return stats.reset_index()
+
+
+def load_major_stats(df, file_path=STUDENT_FILE, tag="mys", reader_version=READER_VERSION):
+    """
+    各专业统计表（带快照缓存）：df为应用已按 tag / reader_version 从 file_path 读取的明细，快照未命中时直接统计它，
+    不再重新解析Excel；快照键 = 源文件内容 + 明细读取版本 + 统计版本，存放在明细快照旁边
+    """
+    return load_table(file_path, lambda path: compute_major_stats(df), tag=f"{tag}_major_stats",
+                      version=(reader_version, STATS_VERSION))
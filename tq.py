@@ -3,14 +3,64 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import os
+from data_cache import file_digest
+from sales_approx import exact_kpi_panel
+from sales_dataset import SalesDataset, SalesStore
+from sales_export import export_panel
+from sales_filter import date_ranges
+from sales_forecast import MODELS, forecast_segments
+from sales_anomaly import DEFAULT_THRESHOLD
+from sales_lattice import PIVOT_MEASURES
+from sales_io import SALES_COLUMNS, derive_hour, read_workbook
+from sales_stream import aggregate_history, list_history_files
+from sales_table import paged_table, top_n_with_rest
+from ui_widgets import date_range_slider
 
-def get_dataframe_from_excel():
-    """读取Excel销售数据，返回处理后的DataFrame（相对路径版）"""
-    # 1. 相对路径：仅写文件名（前提：Excel和脚本在同一目录）
-    excel_filename = "（商场销售数据）supermarket_sales.xlsx"  # Excel文件名（和脚本同目录）
-    excel_path = os.path.join(os.path.dirname(__file__), excel_filename)  # 自动拼接脚本所在目录+文件名
+# 相对路径：仅写文件名（前提：Excel和脚本在同一目录）
+EXCEL_FILENAME = "（商场销售数据）supermarket_sales.xlsx"  # Excel文件名（和脚本同目录）
+EXCEL_PATH = os.path.join(os.path.dirname(__file__), EXCEL_FILENAME)  # 自动拼接脚本所在目录+文件名
+# 多年销售历史目录（按月导出的xlsx/csv），存在时可切换到流式聚合模式
+HISTORY_DIR = os.path.join(os.path.dirname(__file__), "sales_history")
+
+# 核心列
+REQUIRED_COLS = ["订单号", "城市", "顾客类型", "性别", "产品类型", "总价", "评分", "时间"]
+# 可选列（没有日期列时不提供日期筛选、趋势和异常检测）
+OPTIONAL_COLS = ["日期"]
+# 解析逻辑版本号：read_sales_workbook（含它用到的 sales_io 函数和上面的列清单）改动后递增，旧快照随之失效
+READER_VERSION = 2
+
+def read_sales_workbook(excel_path):
+    """解析销售Excel并处理列（结果写入快照，之后冷启动直接读快照）"""
+    # 1. 只读流式打开一次工作簿：优先"销售数据"工作表，否则用第一个；
+    #    自动定位表头行（跳过标题行），只读取核心列和可选列，缺核心列时报错
+    df = read_workbook(excel_path, {col: SALES_COLUMNS[col] for col in REQUIRED_COLS + OPTIONAL_COLS},
+                       sheet_name='销售数据', optional=OPTIONAL_COLS)
+    
+    # 2. 处理订单号索引
+    df = df.set_index("订单号", drop=False)
+    
+    # 3. 提取交易小时数（适配两种时间格式）
+    df["小时数"] = derive_hour(df["时间"])
+    
+    # 4. 处理缺失值
+    df = df.dropna(subset=["总价", "评分", "小时数"])
+    
+    # 5. 按日期排序存放（日期区间筛选对应一段连续行号）
+    if "日期" in df.columns:
+        df = df.sort_values("日期", kind="stable", na_position="last")
+    
+    return df
+
+@st.cache_resource(show_spinner="正在加载销售数据...")
+def get_sales_store():
+    """共享数据集（服务进程内只加载一份，所有会话共用）；Excel被替换时后台重新加载并原子替换"""
+    return SalesStore(EXCEL_PATH, read_sales_workbook, tag="tq", reader_version=READER_VERSION).watch()
+
+def get_sales_data():
+    """读取Excel销售数据，返回共享的只读数据集（相对路径版）"""
+    excel_path = EXCEL_PATH
     
-    # 检查文件是否存在
+    # 1. 检查文件是否存在
     if not os.path.exists(excel_path):
         st.error(f"❌ 未找到Excel文件：{excel_path}")
         st.error("请确认：1.Excel文件和脚本在同一目录 2.文件名（包括括号/中文）完全匹配")
@@ -20,60 +70,39 @@ def get_dataframe_from_excel():
         st.stop()
     
     try:
-        # 2. 读取Excel（适配不同sheet名/列名，跳过标题行）
-        try:
-            df = pd.read_excel(
-                excel_path,
-                sheet_name='销售数据',  # 若sheet名不对，改成Excel里的实际名称（如Sheet1）
-                skiprows=1,            # 跳过第一行标题（2022年前3个月销售数据）
-                engine='openpyxl'
-            )
-        except:
-            df = pd.read_excel(
-                excel_path,
-                sheet_name=0,         # 读取第一个sheet
-                skiprows=1,
-                engine='openpyxl'
-            )
-        
-        # 3. 去除列名首尾空格
-        df.columns = [col.strip() for col in df.columns]
-        
-        # 调试：打印列名
-        st.write("📌 Excel真实列名（跳过标题行后）：")
-        st.write(df.columns.tolist())
-        
-        # 4. 核心列检查
-        required_cols = ["订单号", "城市", "顾客类型", "性别", "产品类型", "总价", "评分", "时间"]
-        missing_cols = [col for col in required_cols if col not in df.columns]
-        if missing_cols:
-            st.error(f"❌ Excel缺少关键列：{missing_cols}")
-            st.stop()
-        
-        # 5. 处理订单号索引
-        df = df.set_index("订单号", drop=False)
-        
-        # 6. 提取交易小时数（适配两种时间格式）
-        df["小时数"] = pd.to_datetime(df["时间"], format="%H:%M:%S", errors="coerce").dt.hour
-        if df["小时数"].isnull().all():
-            df["小时数"] = pd.to_datetime(df["时间"], format="%H:%M", errors="coerce").dt.hour
-        
-        # 7. 处理缺失值
-        df = df.dropna(subset=["总价", "评分", "小时数"])
-        
-        return df
-    
+        # 2. 读取数据（命中快照时内存映射读取；本次运行固定使用当前版本）
+        store = get_sales_store()
+        dataset = store.current
     except Exception as e:
         st.error(f"❌ 读取Excel失败：{str(e)}")
         st.stop()
+    if store.last_error is not None:
+        st.warning(f"⚠️ 最新的Excel文件加载失败，继续使用上一版本数据：{store.last_error}")
+    
+    return dataset
 
-def add_sidebar_func(df):
-    """创建侧边栏筛选器，返回筛选后的数据"""
+def get_dataframe_from_excel():
+    """读取Excel销售数据，返回处理后的DataFrame（只读，请勿修改）"""
+    return get_sales_data().df
+
+@st.cache_resource(show_spinner="正在分块聚合历史销售数据...")
+def get_history_dataset(history_key):
+    """分块流式聚合历史数据（history_key为各文件的 (路径, 内容哈希)，文件变化时重新聚合）"""
+    cube = aggregate_history([path for path, _ in history_key])
+    return SalesDataset("+".join(digest[:8] for _, digest in history_key), cube=cube)
+
+def add_sidebar_func(cube, dates=None):
+    """创建侧边栏筛选器，返回 (筛选条件 {列名: 选中取值}, 日期范围或None)"""
+    date_range = None
     with st.sidebar:
         st.header("🔍 数据筛选条件")
         
+        # 日期范围（只有明细数据带日期索引时提供）
+        if dates is not None:
+            date_range = date_range_slider(dates)
+        
         # 城市筛选
-        city_unique = df["城市"].unique()
+        city_unique = cube.values("城市")
         city = st.multiselect(
             "选择城市：",
             options=city_unique,
@@ -82,7 +111,7 @@ def add_sidebar_func(df):
         )
         
         # 顾客类型筛选
-        customer_type_unique = df["顾客类型"].unique()
+        customer_type_unique = cube.values("顾客类型")
         customer_type = st.multiselect(
             "选择顾客类型：",
             options=customer_type_unique,
@@ -91,7 +120,7 @@ def add_sidebar_func(df):
         )
         
         # 性别筛选
-        gender_unique = df["性别"].unique()
+        gender_unique = cube.values("性别")
         gender = st.multiselect(
             "选择性别：",
             options=gender_unique,
@@ -99,21 +128,23 @@ def add_sidebar_func(df):
             key="gender_select"
         )
         
-        # 应用筛选条件
-        df_selection = df[
-            (df["城市"].isin(city)) &
-            (df["顾客类型"].isin(customer_type)) &
-            (df["性别"].isin(gender))
-        ]
+        # 筛选条件（直接从立方体统计数据量，不扫描明细）
+        selection = {"城市": city, "顾客类型": customer_type, "性别": gender}
         
         # 显示筛选后的数据量
-        st.info(f"筛选后数据量：{len(df_selection)} 条")
+        st.info(f"筛选后数据量：{cube.kpis(cube.mask(selection, date_ranges(date_range)))['订单数']} 条")
+        
+        # 近似模式：指标由分层样本估计，附带95%置信区间
+        st.toggle("近似模式（抽样估计）", key="approx_mode")
     
-    return df_selection
+    return selection, date_range
 
 def product_line_chart(df):
-    """生成按产品类型划分的销售额横向条形图"""
-    sales_by_product_line = df.groupby(by=["产品类型"])["总价"].sum().sort_values()
+    """生成按产品类型划分的销售额横向条形图（df可为明细数据，或已按产品类型汇总的销售额Series）"""
+    if isinstance(df, pd.Series):
+        sales_by_product_line = df.sort_values()
+    else:
+        sales_by_product_line = df.groupby(by=["产品类型"], observed=True)["总价"].sum().sort_values()
     
     fig = px.bar(
         sales_by_product_line,
@@ -135,8 +166,11 @@ def product_line_chart(df):
     return fig
 
 def hour_chart(df):
-    """生成按小时数划分的销售额条形图"""
-    sales_by_hour = df.groupby(by=["小时数"])["总价"].sum()
+    """生成按小时数划分的销售额条形图（df可为明细数据，或已按小时数汇总的销售额Series）"""
+    if isinstance(df, pd.Series):
+        sales_by_hour = df
+    else:
+        sales_by_hour = df.groupby(by=["小时数"])["总价"].sum()
     
     fig = px.bar(
         sales_by_hour,
@@ -156,41 +190,280 @@ def hour_chart(df):
     )
     return fig
 
-def main_page_demo(df):
-    """渲染主页面（关键指标+图表）"""
+def trend_chart(trend, split, measures=("7日均值", "30日均值")):
+    """生成每日销售趋势折线图（trend为 DailyTrend.series 的结果，颜色区分拆分维度，线型区分指标）"""
+    long_df = trend.melt(id_vars=["日期", split], value_vars=list(measures), var_name="指标", value_name="销售额")
+    fig = px.line(
+        long_df,
+        x="日期",
+        y="销售额",
+        color=split,
+        line_dash="指标",
+        title="<b>每日销售额趋势（滑动平均）</b>",
+        template="plotly_white"
+    )
+    
+    fig.update_layout(
+        xaxis_title="日期",
+        yaxis_title="销售额（RMB）",
+        height=400,
+        margin=dict(l=10, r=10, t=30, b=10)
+    )
+    return fig
+
+def format_kpis(kpis):
+    """核心指标 -> 一行展示文字"""
+    return (f"总销售额 ¥ {int(kpis['总销售额']):,}｜平均评分 {kpis['平均评分']:.1f}｜"
+            f"单笔平均销售额 ¥ {kpis['每单平均销售额']:.2f}")
+
+def main_page_demo(dataset, selection, date_range=None):
+    """渲染主页面（关键指标+图表），指标和图表都由立方体单元格求和得到"""
+    df, cube, engine, sample = dataset.df, dataset.cube, dataset.engine, dataset.sample
     st.title(':bar_chart: 超市销售数据分析仪表板')
     st.markdown("---")
     
-    # 计算核心指标
-    total_sales = int(df["总价"].sum())
-    average_rating = round(df["评分"].mean(), 1)
+    # 日期范围 -> 连续行号区间（二分查找），与位图筛选组合
+    row_range = dataset.dates.row_range(*date_range) if date_range else None
+    # 筛选后的行号（每次运行只算一次，订单级Top-N、明细预览和导出共用；历史数据模式没有明细）
+    rows = engine.select(selection, row_range) if df is not None else None
+    
+    # 计算核心指标（近似模式下由分层样本估计，delta显示95%置信区间）
+    mask = cube.mask(selection, date_ranges(date_range))
+    approx = sample is not None and st.session_state.get("approx_mode", False)
+    if approx:
+        estimates = sample.estimate(selection, row_range)
+        kpis = {name: estimates[name][0] for name in ("总销售额", "平均评分", "每单平均销售额")}
+        deltas = [f"±¥ {estimates['总销售额'][1]:,.0f}（95%置信区间）",
+                  f"±{estimates['平均评分'][1]:.2f}（95%置信区间）",
+                  f"±¥ {estimates['每单平均销售额'][1]:.2f}（95%置信区间）"]
+    else:
+        kpis = cube.kpis(mask)
+        deltas = ["本月累计", "顾客满意度", "交易均值"]
+    prefix = "≈ " if approx else ""
+    delta_color = "off" if approx else "normal"
+    total_sales = int(kpis["总销售额"])
+    average_rating = round(kpis["平均评分"], 1)
     star_rating = ":star:" * int(round(average_rating, 0))
-    avg_per_trans = round(df["总价"].mean(), 2)
+    avg_per_trans = round(kpis["每单平均销售额"], 2)
     
     # 核心指标展示
     col1, col2, col3 = st.columns(3)
     with col1:
         st.subheader("总销售额")
-        st.metric(label="", value=f"¥ {total_sales:,}", delta="本月累计")
+        st.metric(label="", value=f"{prefix}¥ {total_sales:,}", delta=deltas[0], delta_color=delta_color)
     with col2:
         st.subheader("平均评分")
-        st.metric(label="", value=f"{average_rating} {star_rating}", delta="顾客满意度")
+        st.metric(label="", value=f"{prefix}{average_rating} {star_rating}", delta=deltas[1], delta_color=delta_color)
     with col3:
         st.subheader("单笔平均销售额")
-        st.metric(label="", value=f"¥ {avg_per_trans}", delta="交易均值")
+        st.metric(label="", value=f"{prefix}¥ {avg_per_trans}", delta=deltas[2], delta_color=delta_color)
+    if approx:
+        exact_kpi_panel(df, engine, selection, format_kpis, row_range)
     
     st.markdown("---")
     
     # 图表展示
     col_left, col_right = st.columns(2)
     with col_left:
-        st.plotly_chart(hour_chart(df), use_container_width=True)
+        st.plotly_chart(hour_chart(cube.sales_by("小时数", mask)), use_container_width=True)
     with col_right:
-        st.plotly_chart(product_line_chart(df), use_container_width=True)
+        st.plotly_chart(product_line_chart(cube.sales_by("产品类型", mask)), use_container_width=True)
+    
+    # 每日销售趋势（累计和在加载时算好，筛选/拆分变化时只做一次矩阵乘法）
+    if dataset.trend is not None:
+        col_split, col_measures = st.columns(2)
+        with col_split:
+            split = st.radio("趋势拆分维度：", ["城市", "产品类型"], horizontal=True, key="trend_split")
+        with col_measures:
+            measures = st.multiselect("显示曲线：", ["日销售额", "7日均值", "30日均值"],
+                                      default=["7日均值", "30日均值"], key="trend_measures")
+        trend = dataset.trend.series(selection, split)
+        if date_range:
+            # 滑动平均按全部历史计算，只截取显示的日期范围
+            in_range = trend["日期"].between(pd.Timestamp(date_range[0]), pd.Timestamp(date_range[1]))
+            trend = trend[in_range]
+        if measures:
+            st.plotly_chart(trend_chart(trend, split, measures), use_container_width=True)
+    
+    # Top-N / 长尾：订单级在筛选后的行上部分选择，其余维度在立方体汇总结果上选择
+    with st.expander("🏆 Top-N / 长尾分析"):
+        levels = (["订单"] if df is not None else []) + [dim for dim in ("产品类型", "城市", "小时数", "日期") if dim in cube.dims]
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            level = st.selectbox("分析对象：", levels, key="topn_level")
+        with col2:
+            n = int(st.number_input("N：", min_value=1, max_value=100, value=10, step=1, key="topn_n"))
+        with col3:
+            largest = st.radio("方向：", ["销售额最高", "销售额最低"], horizontal=True, key="topn_direction") == "销售额最高"
+        if level == "订单":
+            table = top_n_with_rest(df["订单号"].to_numpy()[rows], df["总价"].to_numpy(dtype=float)[rows],
+                                    n, largest, label_col="订单号")
+        else:
+            sales = cube.sales_by(level, mask)
+            table = top_n_with_rest(sales.index.astype(str), sales.to_numpy(), n, largest, label_col=level)
+        st.dataframe(table.round(2), use_container_width=True, hide_index=True)
+    
+    # 异常检测（分数在数据加载时已对全部细分算好，这里只按阈值和筛选条件挑出记录）
+    if dataset.anomalies is not None:
+        with st.expander("🚨 销售异常检测（城市×产品类型）"):
+            col1, col2 = st.columns(2)
+            with col1:
+                level = st.radio("检测粒度：", ["日", "小时"], horizontal=True, key="anomaly_level")
+            with col2:
+                threshold = st.slider("稳健z分数阈值：", min_value=2.0, max_value=8.0,
+                                      value=DEFAULT_THRESHOLD, step=0.5, key="anomaly_threshold")
+            flags = dataset.anomalies.flags(level, threshold)
+            flags = flags[flags["城市"].isin(selection["城市"])]
+            if date_range:
+                flags = flags[flags["日期"].between(pd.Timestamp(date_range[0]), pd.Timestamp(date_range[1]))]
+            st.caption(f"共 {len(flags):,} 条异常（与之前同类时段的中位数比较：按日为前8周同一星期几，按小时为前14天同一小时）")
+            st.dataframe(flags.round(2), use_container_width=True, hide_index=True)
     
-    # 原始数据预览
+    # 原始数据预览（位图索引得到行号，服务端搜索/排序后分页，只发送当前页）
     with st.expander("📋 查看筛选后原始数据"):
-        st.dataframe(df, use_container_width=True)
+        if df is None:
+            st.info("历史数据模式只保留聚合结果，不提供明细预览")
+        else:
+            paged_table(dataset, rows)
+    
+    # 导出筛选后数据（按块流式写到临时文件，不生成完整的筛选副本）
+    if df is not None:
+        with st.expander("📥 导出筛选后数据"):
+            export_panel(df, rows, repr((dataset.version, selection, row_range)))
+
+def segment_filters(cube, index):
+    """第index组的筛选条件（名称+城市/顾客类型/性别），返回 (分组名, 筛选条件)"""
+    customer_types = cube.values("顾客类型")
+    default_types = customer_types[index:index + 1] or customer_types
+    name = st.text_input("分组名称：", value=f"分组{index + 1}", key=f"segment{index}_name")
+    selection = {
+        "城市": st.multiselect("城市：", cube.values("城市"), default=cube.values("城市"), key=f"segment{index}_city"),
+        "顾客类型": st.multiselect("顾客类型：", customer_types, default=default_types, key=f"segment{index}_customer_type"),
+        "性别": st.multiselect("性别：", cube.values("性别"), default=cube.values("性别"), key=f"segment{index}_gender"),
+    }
+    return name.strip() or f"分组{index + 1}", selection
+
+def compare_page(dataset):
+    """分组对比页面：多组命名筛选条件的指标和图表在一次分组聚合中同时算出"""
+    cube = dataset.cube
+    st.title(':scales: 分组对比')
+    st.markdown("---")
+    
+    date_range = None
+    if dataset.dates is not None:
+        with st.sidebar:
+            date_range = date_range_slider(dataset.dates)
+    n_segments = st.number_input("分组数量：", min_value=2, max_value=4, value=2, step=1, key="segment_count")
+    
+    # 各组筛选条件并排显示
+    masks = {}
+    for index, column in enumerate(st.columns(int(n_segments))):
+        with column:
+            name, selection = segment_filters(cube, index)
+            if name in masks:
+                name = f"{name}（{index + 1}）"  # 名称重复时加序号区分
+            masks[name] = cube.mask(selection, date_ranges(date_range))
+    
+    # 一次聚合：分组×单元格 矩阵乘以单元格度量
+    kpis, breakdowns = cube.compare(masks, by=("小时数", "产品类型"))
+    st.dataframe(kpis.style.format({"总销售额": "¥ {:,.0f}", "平均评分": "{:.2f}",
+                                    "每单平均销售额": "¥ {:.2f}", "订单数": "{:,}"}),
+                 use_container_width=True)
+    
+    col_left, col_right = st.columns(2)
+    for column, dim, title in ((col_left, "小时数", "按小时数划分的销售额"), (col_right, "产品类型", "按产品类型划分的销售额")):
+        long_df = breakdowns[dim].reset_index().melt(id_vars=dim, var_name="分组", value_name="总价")
+        fig = px.bar(long_df, x=dim, y="总价", color="分组", barmode="group",
+                     title=f"<b>{title}</b>", template="plotly_white")
+        fig.update_layout(yaxis_title="销售额（RMB）", height=400, margin=dict(l=10, r=10, t=30, b=10))
+        with column:
+            st.plotly_chart(fig, use_container_width=True)
+
+def pivot_page(dataset):
+    """透视分析页面：任选行/列维度和指标，由物化的聚合格汇总得到（不扫描明细行）"""
+    lattice = dataset.lattice
+    st.title(':abacus: 透视分析')
+    st.markdown("---")
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        rows = st.multiselect("行维度：", lattice.dims, default=lattice.dims[:1], key="pivot_rows")
+    with col2:
+        columns = st.multiselect("列维度：", [dim for dim in lattice.dims if dim not in rows],
+                                 default=[dim for dim in ("产品类型",) if dim in lattice.dims and dim not in rows],
+                                 key="pivot_columns")
+    with col3:
+        measure = st.selectbox("指标：", PIVOT_MEASURES, key="pivot_measure")
+    if not rows:
+        st.info("请至少选择一个行维度")
+        return
+    
+    table = lattice.pivot(rows, columns, measure)
+    digits = 0 if measure in ("总销售额", "订单数") else 2
+    st.caption(f"共 {table.shape[0]:,} 行 × {table.shape[1]:,} 列；"
+               f"已物化 {len(lattice.cuboids)} 个维度组合（{lattice.n_cells:,} 个单元格）")
+    st.dataframe(table.round(digits), use_container_width=True)
+
+@st.cache_data(show_spinner="正在拟合预测模型...")
+def get_forecast(_trend, data_version, model, horizon):
+    """预测全部 城市×产品类型（按 数据版本+模型+预测周数 缓存，所有会话共用）"""
+    return forecast_segments(_trend, model, horizon)
+
+def forecast_chart(forecast):
+    """生成周销售额历史+预测折线图（颜色区分细分市场，虚线为预测）"""
+    plot_df = forecast.assign(细分=forecast["城市"].astype(str) + "·" + forecast["产品类型"].astype(str))
+    fig = px.line(
+        plot_df,
+        x="周",
+        y="销售额",
+        color="细分",
+        line_dash="类型",
+        hover_data=["下限", "上限"],
+        title="<b>周销售额预测</b>",
+        template="plotly_white"
+    )
+    
+    fig.update_layout(
+        xaxis_title="周（起始日期）",
+        yaxis_title="销售额（RMB）",
+        height=450,
+        margin=dict(l=10, r=10, t=30, b=10)
+    )
+    return fig
+
+def forecast_page(dataset):
+    """销售预测页面：每个 城市×产品类型 拟合一个轻量模型，预测未来N周"""
+    st.title(':crystal_ball: 销售预测（城市 × 产品类型）')
+    st.markdown("---")
+    if dataset.trend is None:
+        st.info("历史数据模式只保留聚合结果，不提供按日期的预测" if dataset.df is None else "销售数据没有日期列，无法按日期预测")
+        return
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        model = st.selectbox("预测模型：", list(MODELS), key="forecast_model")
+    with col2:
+        horizon = st.slider("预测未来周数：", min_value=1, max_value=12, value=8, key="forecast_horizon")
+    try:
+        forecast = get_forecast(dataset.trend, dataset.version, model, horizon)
+    except ValueError as e:
+        st.warning(f"⚠️ {e}")
+        return
+    
+    # 选择要查看的细分市场（全部细分已一起算好，这里只是过滤展示）
+    col1, col2 = st.columns(2)
+    with col1:
+        cities = st.multiselect("城市：", dataset.options("城市"), default=dataset.options("城市")[:1], key="forecast_cities")
+    with col2:
+        products = st.multiselect("产品类型：", dataset.options("产品类型"), default=dataset.options("产品类型"), key="forecast_products")
+    shown = forecast[forecast["城市"].isin(cities) & forecast["产品类型"].isin(products)]
+    st.plotly_chart(forecast_chart(shown), use_container_width=True)
+    
+    # 未来N周预测合计（城市 × 产品类型）
+    st.markdown(f"#### 未来 {horizon} 周预测销售额合计")
+    future = forecast[forecast["类型"] == "预测"]
+    st.dataframe(future.pivot_table(index="城市", columns="产品类型", values="销售额", aggfunc="sum", observed=True).round(0),
+                 use_container_width=True)
 
 def run_app():
     """应用入口函数"""
@@ -201,9 +474,30 @@ def run_app():
         initial_sidebar_state="expanded"
     )
     
-    df_raw = get_dataframe_from_excel()
-    df_filtered = add_sidebar_func(df_raw)
-    main_page_demo(df_filtered)
+    page = st.sidebar.radio("页面：", ["销售仪表板", "分组对比", "透视分析", "销售预测"], horizontal=True, key="page")
+    
+    # 历史数据模式：分块流式聚合整个历史目录，内存只与聚合单元格数量有关
+    history_files = list_history_files(HISTORY_DIR) if os.path.isdir(HISTORY_DIR) else []
+    dataset = None
+    if history_files and st.sidebar.toggle("历史数据模式（分块流式聚合）", key="history_mode"):
+        try:
+            dataset = get_history_dataset(tuple((path, file_digest(path)) for path in history_files))
+        except ValueError as e:  # 历史文件都是空的（只有表头）
+            st.warning(f"历史数据不可用，已改用当前销售数据：{e}")
+    if dataset is None:
+        dataset = get_sales_data()
+    if page == "分组对比":
+        compare_page(dataset)
+        return
+    if page == "透视分析":
+        pivot_page(dataset)
+        return
+    if page == "销售预测":
+        forecast_page(dataset)
+        return
+    # 会话只保存筛选条件，数据集本身所有会话共用
+    selection, date_range = add_sidebar_func(dataset.cube, dataset.dates)
+    main_page_demo(dataset, selection, date_range)
 
 if __name__ == "__main__":
     run_app()
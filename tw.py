@@ -1,8 +1,17 @@
 import streamlit as st
 import pandas as pd
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import numpy as np
 import os  # 新增：用于检查文件是否存在
+import io
+from sales_dataset import SalesStore  # 进程内共享的只读数据集（明细+立方体+位图索引+分层样本），文件变化时后台热更新
+from sales_approx import exact_kpi_panel  # 近似模式下后台计算精确值
+from sales_filter import date_ranges  # 日期范围 -> 立方体区间筛选条件
+from ui_widgets import date_range_slider  # 日期范围滑块（数据更新后自动恢复为全部日期）
+
+# 数据文件（Cloud项目根目录下的相对路径）
+DATA_FILE = "supermarket_sales.xlsx"
 
 # 设置中文字体
 plt.rcParams['font.sans-serif'] = ['SimHei', 'Arial Unicode MS']
@@ -37,34 +46,122 @@ h3 {
 """, unsafe_allow_html=True)
 
 # 1. 数据加载（适配Cloud环境：相对路径+文件存在性检查）
+# 解析逻辑版本号：read_sales_excel 改动后递增，旧快照随之失效
+READER_VERSION = 1
+
+def read_sales_excel(file_path):
+    """解析Excel并处理时间列（结果写入快照，之后冷启动直接读快照）"""
+    # 读取Excel（header=1保持不变，第2行为列名）
+    df = pd.read_excel(file_path, header=1)
+
+    # 时间列处理（适配带秒格式）
+    df['时间_小时'] = pd.to_datetime(df['时间'], format='%H:%M:%S').dt.hour
+    df['日期'] = pd.to_datetime(df['日期'], format='%Y/%m/%d')
+    # 按日期排序存放（日期区间筛选对应一段连续行号）
+    return df.sort_values('日期', kind='stable', na_position='last')
+
+# 共享数据集：每个数据版本在服务进程内只加载一份（明细来自内存映射快照），所有会话共用，
+# 会话只保存自己的筛选条件，不再各自持有一份DataFrame；
+# Excel被替换时由后台线程重新加载并原子替换，页面请求不再计算文件哈希、也不等待重新加载
+@st.cache_resource(show_spinner="正在加载销售数据...")
+def get_sales_store():
+    return SalesStore(DATA_FILE, read_sales_excel, tag="tw", hour_col='时间_小时', reader_version=READER_VERSION).watch()
+
 def load_data():
     # 关键修改：使用Cloud项目根目录的相对路径（仅文件名）
-    file_name = "supermarket_sales.xlsx"
+    file_name = DATA_FILE
     file_path = file_name  # 直接读取根目录下的文件
     
-    # 检查文件是否存在（帮助排查问题）
-    st.write("当前目录下的文件：", os.listdir('.'))  # 部署后可删除此行
-    if file_name not in os.listdir('.'):
+    # 检查文件是否存在（只检查这一个文件，不再每次列出整个目录）
+    if not os.path.exists(file_path):
         st.error(f"错误：未找到 {file_name} 文件！请确认文件已上传到项目根目录，且文件名完全一致（区分大小写）。")
         st.stop()  # 终止程序，避免后续报错
     
-    # 读取Excel（header=1保持不变，第2行为列名）
-    df = pd.read_excel(file_path, header=1)
-    
-    # 时间列处理（适配带秒格式）
-    df['时间_小时'] = pd.to_datetime(df['时间'], format='%H:%M:%S').dt.hour
-    df['日期'] = pd.to_datetime(df['日期'], format='%Y/%m/%d')
-    
+    # 读取数据（本次运行固定使用当前版本，运行中途数据更新也不会前后不一致）
+    store = get_sales_store()
+    dataset = store.current
+    if store.last_error is not None:
+        st.warning(f"最新的Excel文件加载失败，继续使用上一版本数据：{store.last_error}")
+
     # 提取维度分类
-    cities = df['城市'].unique().tolist()
-    customer_types = df['顾客类型'].unique().tolist()
-    genders = df['性别'].unique().tolist()
-    product_types = df['产品类型'].unique().tolist()
+    cities = dataset.options('城市')
+    customer_types = dataset.options('顾客类型')
+    genders = dataset.options('性别')
+    product_types = dataset.options('产品类型')
     
-    return df, cities, customer_types, genders, product_types
+    return dataset, cities, customer_types, genders, product_types
+
+# 渲染销售分布图为PNG（有界LRU缓存，按 规范化筛选条件+数据版本 缓存，所有会话共用，
+# 重复的筛选组合直接返回PNG字节，不再调用matplotlib）
+@st.cache_data(max_entries=64)
+def render_sales_figure(_cube, selection_key, date_range, data_version):
+    cell_mask = _cube.mask(dict(selection_key), date_ranges(date_range))
+    # 直接创建Figure而不用pyplot全局状态，多会话并发渲染时互不干扰
+    fig = Figure(figsize=(16, 6))
+    ax1, ax2 = fig.subplots(1, 2)
+
+    # 子图1：按小时划分的销售额（柱状图）
+    hourly_sales = _cube.sales_by('时间_小时', cell_mask).reset_index()
+    ax1.bar(
+        x=hourly_sales['时间_小时'],
+        height=hourly_sales['总价'],
+        color='#1f77b4',
+        edgecolor='white'
+    )
+    ax1.set_title("按小时划分的销售额", fontweight='bold', fontsize=12)
+    ax1.set_xlabel("小时数")
+    ax1.set_ylabel("总价")
+    ax1.grid(alpha=0.3, axis='y')
+    ax1.set_xticks(hourly_sales['时间_小时'])  # 显示所有存在的小时
+
+    # 子图2：按产品类型划分的销售额（水平条形图）
+    product_sales = _cube.sales_by('产品类型', cell_mask).sort_values(ascending=True)  # 升序排列（大值在上方）
+    ax2.barh(
+        y=product_sales.index,
+        width=product_sales.values,
+        color='#ff7f0e',
+        edgecolor='white'
+    )
+    ax2.set_title("按产品类型划分的销售额", fontweight='bold', fontsize=12)
+    ax2.set_xlabel("总价")
+    ax2.set_ylabel("产品类型")
+    ax2.grid(alpha=0.3, axis='x')
+
+    fig.tight_layout()
+    # 与st.pyplot相同的导出参数
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=200, bbox_inches='tight')
+    return buf.getvalue()
+
+# 渲染每日销售趋势图为PNG（7日/30日滑动平均，由趋势累计和相减得到；缓存方式同上）
+@st.cache_data(max_entries=64)
+def render_trend_figure(_trend, selection_key, split, date_range, data_version):
+    trend = _trend.series(dict(selection_key), split)
+    if date_range is not None:
+        # 滑动平均按全部历史计算，只截取显示的日期范围
+        trend = trend[trend['日期'].between(pd.Timestamp(date_range[0]), pd.Timestamp(date_range[1]))]
+    fig = Figure(figsize=(16, 5))
+    ax = fig.subplots()
+    for i, (name, group) in enumerate(trend.groupby(split, sort=True)):
+        color = f'C{i}'
+        ax.plot(group['日期'], group['7日均值'], color=color, label=f"{name}（7日均值）")
+        ax.plot(group['日期'], group['30日均值'], color=color, linestyle='--', label=f"{name}（30日均值）")
+    ax.set_title("每日销售额趋势（滑动平均）", fontweight='bold', fontsize=12)
+    ax.set_xlabel("日期")
+    ax.set_ylabel("总价")
+    ax.grid(alpha=0.3)
+    if len(trend):
+        ax.legend(ncol=2, fontsize=9)
+
+    fig.tight_layout()
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=200, bbox_inches='tight')
+    return buf.getvalue()
 
 # 加载数据
-df, cities, customer_types, genders, product_types = load_data()
+dataset, cities, customer_types, genders, product_types = load_data()
+data_version = dataset.version
+cube = dataset.cube
 
 # 2. 页面布局：左侧筛选栏 + 右侧内容区
 left_col, main_col = st.columns([1, 3])  # 左侧占1份，右侧占3份
@@ -99,18 +196,31 @@ with left_col:
         default=genders,
         key="gender_select"
     )
+    
+    # 日期筛选（数据更新后日期范围变了，恢复为全部日期）
+    st.markdown("#### 请选择日期范围:")
+    date_range = date_range_slider(dataset.dates, label="日期范围")  # 选中全部日期时为None
+    
+    # 近似模式：指标由分层样本估计，附带95%置信区间
+    approx_mode = st.toggle("近似模式（抽样估计）", key="approx_mode")
 
-# 3. 数据筛选
-filtered_df = df[
-    (df['城市'].isin(selected_cities)) &
-    (df['顾客类型'].isin(selected_customers)) &
-    (df['性别'].isin(selected_genders))
-].copy()
+# 3. 数据筛选（只筛选立方体单元格，不扫描明细行）
+selection = {'城市': selected_cities, '顾客类型': selected_customers, '性别': selected_genders}
+# 日期范围：明细按日期排序，二分查找得到连续行号区间（选中全部日期时为None）
+row_range = dataset.dates.row_range(*date_range) if date_range else None
+cell_mask = cube.mask(selection, date_ranges(date_range))
 
-# 4. 核心指标计算
-total_sales = filtered_df['总价'].sum()
-avg_rating = filtered_df['评分'].mean()
-avg_order_sales = filtered_df['总价'].mean()
+# 4. 核心指标计算（单元格求和；近似模式下由分层样本估计）
+if approx_mode:
+    estimates = dataset.sample.estimate(selection, row_range)
+    kpis = {name: estimates[name][0] for name in ('总销售额', '平均评分', '每单平均销售额')}
+    margins = {name: estimates[name][1] for name in kpis}
+else:
+    kpis = cube.kpis(cell_mask)
+total_sales = kpis['总销售额']
+avg_rating = kpis['平均评分']
+avg_order_sales = kpis['每单平均销售额']
+prefix = "≈ " if approx_mode else ""
 
 # 右侧内容区（仪表板主体）
 with main_col:
@@ -122,51 +232,43 @@ with main_col:
     
     with col1:
         st.markdown("### 总销售额:")
-        st.markdown(f'<p class="big-value">RMB ¥{total_sales:,.0f}</p>', unsafe_allow_html=True)
+        st.markdown(f'<p class="big-value">{prefix}RMB ¥{total_sales:,.0f}</p>', unsafe_allow_html=True)
+        if approx_mode:
+            st.caption(f"±¥{margins['总销售额']:,.0f}（95%置信区间）")
     
     with col2:
         st.markdown("### 顾客评分的平均值:")
         # 生成对应数量的星星（取整）
         star_count = int(round(avg_rating, 0))
         stars = "★" * star_count
-        st.markdown(f'<p class="big-value">{avg_rating:.1f} {stars}</p>', unsafe_allow_html=True)
+        st.markdown(f'<p class="big-value">{prefix}{avg_rating:.1f} {stars}</p>', unsafe_allow_html=True)
+        if approx_mode:
+            st.caption(f"±{margins['平均评分']:.2f}（95%置信区间）")
     
     with col3:
         st.markdown("### 每单的平均销售额:")
-        st.markdown(f'<p class="big-value">RMB ¥{avg_order_sales:.2f}</p>', unsafe_allow_html=True)
+        st.markdown(f'<p class="big-value">{prefix}RMB ¥{avg_order_sales:.2f}</p>', unsafe_allow_html=True)
+        if approx_mode:
+            st.caption(f"±¥{margins['每单平均销售额']:.2f}（95%置信区间）")
+    
+    # 近似模式下可在后台计算精确值
+    if approx_mode:
+        exact_kpi_panel(
+            dataset.df, dataset.engine, selection,
+            lambda exact: f"总销售额 RMB ¥{exact['总销售额']:,.0f}｜评分平均值 {exact['平均评分']:.1f}｜"
+                          f"每单平均销售额 RMB ¥{exact['每单平均销售额']:.2f}",
+            row_range
+        )
     
     st.markdown("---")  # 分隔线
     
     # 可视化图表区域
     st.markdown("### 销售数据分布")
-    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 6))
-
-    # 子图1：按小时划分的销售额（柱状图）
-    hourly_sales = filtered_df.groupby('时间_小时')['总价'].sum().reset_index()
-    ax1.bar(
-        x=hourly_sales['时间_小时'],
-        height=hourly_sales['总价'],
-        color='#1f77b4',
-        edgecolor='white'
-    )
-    ax1.set_title("按小时划分的销售额", fontweight='bold', fontsize=12)
-    ax1.set_xlabel("小时数")
-    ax1.set_ylabel("总价")
-    ax1.grid(alpha=0.3, axis='y')
-    ax1.set_xticks(hourly_sales['时间_小时'])  # 显示所有存在的小时
-
-    # 子图2：按产品类型划分的销售额（水平条形图）
-    product_sales = filtered_df.groupby('产品类型')['总价'].sum().sort_values(ascending=True)  # 升序排列（大值在上方）
-    ax2.barh(
-        y=product_sales.index,
-        width=product_sales.values,
-        color='#ff7f0e',
-        edgecolor='white'
-    )
-    ax2.set_title("按产品类型划分的销售额", fontweight='bold', fontsize=12)
-    ax2.set_xlabel("总价")
-    ax2.set_ylabel("产品类型")
-    ax2.grid(alpha=0.3, axis='x')
-
-    plt.tight_layout()
-    st.pyplot(fig)
+    # 筛选条件规范化（各维度取值排序），作为缓存键
+    selection_key = tuple((dim, tuple(sorted(values))) for dim, values in selection.items())
+    st.image(render_sales_figure(cube, selection_key, date_range, data_version), width="stretch")
+    
+    # 每日销售趋势（按城市或产品类型拆分）
+    st.markdown("### 每日销售趋势")
+    trend_split = st.radio("拆分维度", ['城市', '产品类型'], horizontal=True, key="trend_split")
+    st.image(render_trend_figure(dataset.trend, selection_key, trend_split, date_range, data_version), width="stretch")
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+看板共用的 Streamlit 控件（日期范围滑块、分页器；tq.py / tw.py / 明细表 / 批量预测名单共用）
+特点：控件状态放在 session_state 中，数据更新后取值超出新范围时自动恢复默认值，不会报错
+"""
+
+import streamlit as st
+
+# 每页行数选项
+PAGE_SIZES = (20, 50, 100, 500)
+
+
+def date_range_slider(dates, label="选择日期范围：", key="date_range"):
+    """
+    日期范围滑块（dates为 sales_filter.DateIndex），返回 (开始日期, 结束日期)；选中全部日期时返回None
+    数据更新后日期范围变了（会话中保存的范围超出新范围），恢复为全部日期
+    """
+    first, last = dates.bounds()
+    chosen = st.session_state.get(key)
+    if chosen is not None and (chosen[0] < first or chosen[1] > last):
+        del st.session_state[key]
+    start, end = st.slider(label, min_value=first, max_value=last,
+                           value=(first, last), format="YYYY-MM-DD", key=key)
+    return None if (start, end) == (first, last) else (start, end)
+
+
+def pager(n_rows, page_size, key, caption="共 {n_rows:,} 条，第 {page} / {n_pages} 页"):
+    """
+    页码输入框 + 说明文字，返回当前页的行区间 (起始, 结束)，调用方只取这一段发送到浏览器
+    页码保存在 session_state[f"{key}_page"]；结果变少后页码超出范围时回到第一页
+    caption：说明文字模板（可用 n_rows、page、n_pages）
+    """
+    n_pages = max(1, -(-n_rows // page_size))
+    if st.session_state.get(f"{key}_page", 1) > n_pages:
+        st.session_state[f"{key}_page"] = 1
+    page = int(st.number_input("页码", min_value=1, max_value=n_pages, value=1, step=1, key=f"{key}_page"))
+    st.caption(caption.format(n_rows=n_rows, page=page, n_pages=n_pages))
+    start = (page - 1) * page_size
+    return start, min(start + page_size, n_rows)